@@ -0,0 +1,196 @@
+import os
+import sqlite3
+import threading
+import time
+
+# Agregados do histórico de envios (data/analise.db), para a página /analytics.
+# São atualizados só com os registros novos do envios.db (id maior que o último já
+# somado), então a página não depende do tamanho do histórico.
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS an_hora (
+    hora TEXT PRIMARY KEY,
+    ok INTEGER NOT NULL DEFAULT 0,
+    falhas INTEGER NOT NULL DEFAULT 0,
+    rejeitados INTEGER NOT NULL DEFAULT 0,
+    n_tempo INTEGER NOT NULL DEFAULT 0,
+    soma_total REAL NOT NULL DEFAULT 0,
+    soma_pagina REAL NOT NULL DEFAULT 0,
+    soma_footer REAL NOT NULL DEFAULT 0,
+    soma_envio REAL NOT NULL DEFAULT 0
+);
+CREATE TABLE IF NOT EXISTS an_erros (
+    dia TEXT NOT NULL,
+    classe TEXT NOT NULL,
+    n INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (dia, classe)
+);
+CREATE TABLE IF NOT EXISTS an_templates (
+    template TEXT PRIMARY KEY,
+    campanhas INTEGER NOT NULL DEFAULT 0,
+    ok INTEGER NOT NULL DEFAULT 0,
+    falhas INTEGER NOT NULL DEFAULT 0,
+    rejeitados INTEGER NOT NULL DEFAULT 0,
+    ultimo_ts TEXT
+);
+CREATE TABLE IF NOT EXISTS an_posicao (
+    id INTEGER PRIMARY KEY CHECK (id = 1),
+    envio INTEGER NOT NULL,
+    campanha INTEGER NOT NULL
+);
+"""
+
+# Classe da falha de cada registro. Registros anteriores à coluna `tipo` são
+# classificados pelo texto do erro; linhas rejeitadas na planilha não têm mensagem.
+CLASSE = """
+    CASE WHEN status = 'ok' THEN NULL
+         WHEN tipo IS NOT NULL THEN tipo
+         WHEN msg IS NULL THEN 'rejeitado'
+         WHEN erro = 'Timeout ao abrir chat' THEN 'timeout_chat'
+         WHEN erro = 'Número não encontrado no WhatsApp' THEN 'numero_invalido'
+         WHEN erro = 'Falha ao enviar mensagem' THEN 'falha_envio'
+         WHEN erro = 'Envio não confirmado' THEN 'nao_confirmado'
+         ELSE 'outro' END"""
+
+# Registros novos (id em (?, ?]) com a classe da falha calculada.
+# As contagens usam TOTAL() (0 em vez de NULL quando nenhum registro se encaixa).
+NOVOS = f"""
+    SELECT e.ts, e.status, e.t_total, e.t_pagina, e.t_footer, e.t_envio,
+           COALESCE(c.template, '') AS template, {CLASSE} AS classe
+    FROM src.envios e LEFT JOIN src.campanhas c ON c.id = e.campanha
+    WHERE e.id > ? AND e.id <= ?"""
+
+SOMAR_HORAS = f"""
+INSERT INTO an_hora (hora, ok, falhas, rejeitados, n_tempo, soma_total, soma_pagina, soma_footer, soma_envio)
+SELECT substr(ts, 1, 13), TOTAL(status = 'ok'), TOTAL(classe IS NOT NULL AND classe != 'rejeitado'),
+       TOTAL(classe = 'rejeitado'), TOTAL(status = 'ok' AND t_total IS NOT NULL),
+       TOTAL(CASE WHEN status = 'ok' THEN t_total END), TOTAL(CASE WHEN status = 'ok' AND t_total IS NOT NULL THEN t_pagina END),
+       TOTAL(CASE WHEN status = 'ok' AND t_total IS NOT NULL THEN t_footer END),
+       TOTAL(CASE WHEN status = 'ok' AND t_total IS NOT NULL THEN t_envio END)
+FROM ({NOVOS}) WHERE true GROUP BY 1
+ON CONFLICT (hora) DO UPDATE SET
+    ok = ok + excluded.ok, falhas = falhas + excluded.falhas, rejeitados = rejeitados + excluded.rejeitados,
+    n_tempo = n_tempo + excluded.n_tempo, soma_total = soma_total + excluded.soma_total,
+    soma_pagina = soma_pagina + excluded.soma_pagina, soma_footer = soma_footer + excluded.soma_footer,
+    soma_envio = soma_envio + excluded.soma_envio
+"""
+
+SOMAR_ERROS = f"""
+INSERT INTO an_erros (dia, classe, n)
+SELECT substr(ts, 1, 10), classe, COUNT(*) FROM ({NOVOS}) WHERE classe IS NOT NULL GROUP BY 1, 2
+ON CONFLICT (dia, classe) DO UPDATE SET n = n + excluded.n
+"""
+
+SOMAR_TEMPLATES = f"""
+INSERT INTO an_templates (template, ok, falhas, rejeitados, ultimo_ts)
+SELECT template, TOTAL(status = 'ok'), TOTAL(classe IS NOT NULL AND classe != 'rejeitado'),
+       TOTAL(classe = 'rejeitado'), MAX(ts)
+FROM ({NOVOS}) WHERE true GROUP BY 1
+ON CONFLICT (template) DO UPDATE SET
+    ok = ok + excluded.ok, falhas = falhas + excluded.falhas, rejeitados = rejeitados + excluded.rejeitados,
+    ultimo_ts = MAX(COALESCE(ultimo_ts, ''), excluded.ultimo_ts)
+"""
+
+SOMAR_CAMPANHAS = """
+INSERT INTO an_templates (template, campanhas)
+SELECT COALESCE(template, ''), COUNT(*) FROM src.campanhas WHERE id > ? AND id <= ? GROUP BY 1
+ON CONFLICT (template) DO UPDATE SET campanhas = campanhas + excluded.campanhas
+"""
+
+
+class Analise:
+    """
+    Agregados do histórico de envios por hora, por classe de erro e por template.
+    `atualizar()` soma apenas os registros gravados desde a última chamada (o envios.db
+    é anexado somente para leitura e a agregação é feita pelo SQLite); as consultas da
+    página leem só as tabelas agregadas, que crescem com as horas, não com os envios.
+    """
+
+    def __init__(self, path, sent_db):
+        self.path = path
+        self.sent_db = sent_db
+        self._lock = threading.Lock()
+        self._conn = None
+
+    def _abrir(self):
+        if not os.path.exists(self.sent_db):
+            return False
+        conn = sqlite3.connect(self.path, check_same_thread=False, uri=True)
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.execute('PRAGMA synchronous=NORMAL')
+        conn.executescript(SCHEMA)
+        conn.execute('ATTACH DATABASE ? AS src', (f'file:{self.sent_db}?mode=ro',))
+        self._conn = conn
+        return True
+
+    def atualizar(self):
+        """Soma os registros novos do envios.db. Retorna quantos registros entraram."""
+        with self._lock:
+            if self._conn is None and not self._abrir():
+                return 0
+            conn = self._conn
+            posicao = conn.execute('SELECT envio, campanha FROM an_posicao').fetchone() or (0, 0)
+            ate = conn.execute('SELECT COALESCE(MAX(id), 0) FROM src.envios').fetchone()[0]
+            ate_campanha = conn.execute('SELECT COALESCE(MAX(id), 0) FROM src.campanhas').fetchone()[0]
+            if ate < posicao[0] or ate_campanha < posicao[1]:
+                # Banco de envios recriado: refazer os agregados do zero
+                with conn:
+                    for tabela in ('an_hora', 'an_erros', 'an_templates', 'an_posicao'):
+                        conn.execute(f'DELETE FROM {tabela}')
+                posicao = (0, 0)
+            if (ate, ate_campanha) == posicao:
+                return 0
+            with conn:
+                conn.execute(SOMAR_CAMPANHAS, (posicao[1], ate_campanha))
+                for sql in (SOMAR_HORAS, SOMAR_ERROS, SOMAR_TEMPLATES):
+                    conn.execute(sql, (posicao[0], ate))
+                conn.execute('INSERT OR REPLACE INTO an_posicao (id, envio, campanha) VALUES (1, ?, ?)',
+                             (ate, ate_campanha))
+            return ate - posicao[0]
+
+    def painel(self, horas=48, dias=30, max_templates=20):
+        """
+        Dados da página /analytics: totais, envios por hora (últimas `horas`) e por dia
+        (últimos `dias`, com a latência média), erros por classe e totais por template.
+        Horas e dias sem envios entram com zero.
+        """
+        agora = time.time()
+        ultimas_horas = [time.strftime('%Y-%m-%d %H', time.localtime(agora - i * 3600))
+                         for i in range(horas - 1, -1, -1)]
+        ultimos_dias = [time.strftime('%Y-%m-%d', time.localtime(agora - i * 86400))
+                        for i in range(dias - 1, -1, -1)]
+        dados = {'totais': {'ok': 0, 'falhas': 0, 'rejeitados': 0}, 'horas': [], 'dias': [],
+                 'erros': [], 'templates': []}
+        with self._lock:
+            if self._conn is not None:
+                conn = self._conn
+                ok, falhas, rejeitados = conn.execute(
+                    'SELECT TOTAL(ok), TOTAL(falhas), TOTAL(rejeitados) FROM an_hora').fetchone()
+                dados['totais'] = {'ok': int(ok), 'falhas': int(falhas), 'rejeitados': int(rejeitados)}
+                por_hora = {hora: (ok, falhas) for hora, ok, falhas in conn.execute(
+                    'SELECT hora, ok, falhas FROM an_hora WHERE hora >= ?', (ultimas_horas[0],))}
+                por_dia = {linha[0]: linha[1:] for linha in conn.execute(
+                    'SELECT substr(hora, 1, 10), SUM(ok), SUM(falhas), SUM(rejeitados), SUM(n_tempo), '
+                    'SUM(soma_total), SUM(soma_pagina), SUM(soma_footer), SUM(soma_envio) '
+                    'FROM an_hora WHERE hora >= ? GROUP BY 1', (ultimos_dias[0],))}
+                dados['erros'] = conn.execute(
+                    'SELECT classe, SUM(n) FROM an_erros GROUP BY classe ORDER BY 2 DESC').fetchall()
+                dados['templates'] = conn.execute(
+                    'SELECT template, campanhas, ok, falhas, rejeitados, ultimo_ts FROM an_templates '
+                    'ORDER BY ultimo_ts IS NULL, ultimo_ts DESC LIMIT ?', (max_templates,)).fetchall()
+            else:
+                por_hora, por_dia = {}, {}
+
+        dados['horas'] = [(hora,) + por_hora.get(hora, (0, 0)) for hora in ultimas_horas]
+        for dia in ultimos_dias:
+            ok, falhas, rejeitados, n_tempo, total, pagina, footer, envio = por_dia.get(dia, (0,) * 8)
+            # Latência média dos envios com sucesso (None nos dias sem envios medidos)
+            medias = {fase: soma / n_tempo if n_tempo else None
+                      for fase, soma in (('total', total), ('pagina', pagina), ('footer', footer), ('envio', envio))}
+            dados['dias'].append((dia, ok, falhas, rejeitados, medias))
+        return dados
+
+    def close(self):
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
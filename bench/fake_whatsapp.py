@@ -0,0 +1,214 @@
+"""
+Página falsa do WhatsApp Web para o benchmark (localhost, sem conta real).
+
+Reproduz apenas o que o sender.py usa:
+  - página inicial com a lista de conversas (#pane-side) -> login pronto
+  - /send?phone=&text= com #main/footer, campo contenteditable (data-tab='10')
+    pré-preenchido com o texto e botão de enviar
+  - diálogo de número inválido (números terminados em '0000')
+  - links clicados dentro da página NÃO são interceptados: não há garantia de que o WhatsApp Web
+    real abra a conversa sem recarregar, então NAV_MODE=app mede aqui o custo da volta para a URL
+  - latências configuráveis para o carregamento, o pré-preenchimento e o envio
+  - um pacote JS estático (/static/app.js, cacheável) carregado antes da página ficar pronta,
+    para medir a abertura com e sem o cache de arquivos (ASSET_CACHE)
+  - fotos de perfil na lista de conversas e uma fonte web (/static/...), para medir o modo
+    leve (LEAN_BROWSER), que não as baixa
+"""
+import json
+import os
+import struct
+import threading
+import time
+import zlib
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse
+
+PAGE = """<!DOCTYPE html>
+<html><head><meta charset="utf-8"><title>WhatsApp (benchmark)</title>__BUNDLE__</head>
+<body>
+<div id="app">
+  <div id="pane-side" aria-label="Chat list">__AVATARES__</div>
+  <div id="conversa"></div>
+</div>
+<script>
+var CFG = __CFG__;
+
+function invalido(phone) { return /0000$/.test(phone); }
+
+function abrirConversa(phone, text) {
+  var antigo = document.getElementById('main');
+  if (antigo) antigo.remove();
+  var dlg = document.getElementById('dialogo');
+  if (dlg) dlg.remove();
+  setTimeout(function () {
+    if (invalido(phone)) {
+      var d = document.createElement('div');
+      d.id = 'dialogo';
+      d.setAttribute('role', 'dialog');
+      d.innerHTML = '<div>Phone number shared via url is invalid.</div>';
+      document.body.appendChild(d);
+      return;
+    }
+    var main = document.createElement('div');
+    main.id = 'main';
+    main.innerHTML =
+      '<header>' + phone + '</header>' +
+      '<footer><div contenteditable="true" role="textbox" data-tab="10"></div>' +
+      '<button aria-label="Send" aria-disabled="true"><span data-icon="send"></span></button></footer>';
+    document.getElementById('conversa').appendChild(main);
+    var campo = main.querySelector('[contenteditable]');
+    var botao = main.querySelector('button');
+    function atualizarBotao() {
+      botao.setAttribute('aria-disabled', campo.innerText.trim() ? 'false' : 'true');
+    }
+    campo.addEventListener('input', atualizarBotao);
+    campo.addEventListener('keydown', function (ev) {
+      if (ev.key !== 'Enter' || ev.shiftKey) return;
+      ev.preventDefault();
+      var texto = campo.innerText;
+      setTimeout(function () {
+        campo.innerText = '';
+        atualizarBotao();
+        fetch('/sent', {method: 'POST', body: JSON.stringify({phone: phone, text: texto})});
+      }, CFG.envio);
+    });
+    if (text) {
+      setTimeout(function () { campo.innerText = text; atualizarBotao(); }, CFG.preenchimento);
+    }
+  }, CFG.pagina);
+}
+
+var q = new URLSearchParams(location.search);
+if (location.pathname === '/send' && q.get('phone')) abrirConversa(q.get('phone'), q.get('text'));
+</script>
+</body></html>
+"""
+
+
+def gerar_bundle(kb):
+    """JS sintético de ~`kb` KiB: muitas funções pequenas, para o V8 ter o que compilar."""
+    partes, tamanho, i = [], 0, 0
+    while tamanho < kb * 1024:
+        parte = f'function m{i}(a,b){{var s=0;for(var k=0;k<a;k++){{s+=(k*{i})%(b+1);}}return s+"{i}";}}\n'
+        partes.append(parte)
+        tamanho += len(parte)
+        i += 1
+    partes.append(f'window.__bundle = m{i - 1}(3, 7);\n')
+    return ''.join(partes).encode('utf-8')
+
+
+def gerar_png(lado):
+    """PNG RGB de `lado` x `lado` pixels com ruído (não comprime: o navegador decodifica tudo)."""
+    def bloco(tipo, dados):
+        return struct.pack('>I', len(dados)) + tipo + dados + struct.pack('>I', zlib.crc32(tipo + dados))
+    linhas = b''.join(b'\x00' + os.urandom(lado * 3) for _ in range(lado))
+    return (b'\x89PNG\r\n\x1a\n' + bloco(b'IHDR', struct.pack('>IIBBBBB', lado, lado, 8, 2, 0, 0, 0))
+            + bloco(b'IDAT', zlib.compress(linhas)) + bloco(b'IEND', b''))
+
+
+# Fonte web da página (os bytes não são uma fonte válida; basta o navegador pedi-la)
+FONTE = '<style>@font-face{font-family:wa;src:url(/static/fonte.woff2) format("woff2")}body{font-family:wa,sans-serif}</style>'
+
+
+class FakeWhatsApp:
+    """Servidor HTTP local com a página falsa. Latências em milissegundos."""
+
+    def __init__(self, pagina=50, preenchimento=50, envio=50, port=0, bundle_kb=0, bundle_ms=0, avatares=0):
+        self.cfg = {'pagina': pagina, 'preenchimento': preenchimento, 'envio': envio}
+        self.enviados = []
+        # Pacote JS estático (como os do WhatsApp Web): servido com cache longo; `downloads`
+        # conta quantas vezes o navegador precisou baixá-lo
+        self.bundle = gerar_bundle(bundle_kb) if bundle_kb else None
+        self.bundle_ms = bundle_ms
+        self.downloads = 0
+        # Fotos de perfil (imagens de 256x256) e fonte web; `midia` conta os pedidos das duas
+        self.avatares = avatares
+        self.avatar = gerar_png(256) if avatares else None
+        self.midia = 0
+        self._lock = threading.Lock()
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                path = urlparse(self.path).path
+                if path == '/static/app.js' and fake.bundle is not None:
+                    with fake._lock:
+                        fake.downloads += 1
+                    time.sleep(fake.bundle_ms / 1000)
+                    self.send_response(200)
+                    self.send_header('Content-Type', 'application/javascript; charset=utf-8')
+                    self.send_header('Content-Length', str(len(fake.bundle)))
+                    self.send_header('Cache-Control', 'public, max-age=31536000, immutable')
+                    self.end_headers()
+                    self.wfile.write(fake.bundle)
+                    return
+                if fake.avatares and (path.startswith('/static/avatar/') or path == '/static/fonte.woff2'):
+                    with fake._lock:
+                        fake.midia += 1
+                    fonte = path.endswith('.woff2')
+                    corpo = b'\x00' * 20000 if fonte else fake.avatar
+                    self.send_response(200)
+                    self.send_header('Content-Type', 'font/woff2' if fonte else 'image/png')
+                    self.send_header('Content-Length', str(len(corpo)))
+                    self.send_header('Cache-Control', 'no-store')
+                    self.end_headers()
+                    self.wfile.write(corpo)
+                    return
+                if path not in ('/', '/send'):
+                    self.send_error(404)
+                    return
+                cabecalho = '<script src="/static/app.js"></script>' if fake.bundle is not None else ''
+                avatares = ''
+                if fake.avatares:
+                    cabecalho += FONTE
+                    avatares = ''.join(f'<div><img src="/static/avatar/{i}.png" width="49" height="49">Contato {i}</div>'
+                                       for i in range(fake.avatares))
+                body = (PAGE.replace('__CFG__', json.dumps(fake.cfg)).replace('__BUNDLE__', cabecalho)
+                        .replace('__AVATARES__', avatares).encode('utf-8'))
+                self.send_response(200)
+                self.send_header('Content-Type', 'text/html; charset=utf-8')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def do_POST(self):
+                tamanho = int(self.headers.get('Content-Length') or 0)
+                dados = json.loads(self.rfile.read(tamanho) or b'{}')
+                with fake._lock:
+                    fake.enviados.append(dados)
+                self.send_response(204)
+                self.end_headers()
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(('127.0.0.1', port), Handler)
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+
+    @property
+    def url(self):
+        return f'http://127.0.0.1:{self.server.server_address[1]}'
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Página falsa do WhatsApp Web para testes manuais')
+    parser.add_argument('--port', type=int, default=8090)
+    parser.add_argument('--latencia', type=int, default=50, help='latência de cada fase (ms)')
+    args = parser.parse_args()
+    with FakeWhatsApp(args.latencia, args.latencia, args.latencia, port=args.port) as fake:
+        print(f'WhatsApp falso em {fake.url} (Ctrl+C para sair)')
+        try:
+            while True:
+                time.sleep(1)
+        except KeyboardInterrupt:
+            pass
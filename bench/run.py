@@ -0,0 +1,470 @@
+"""
+Benchmark offline do Bot WhatsApp (sem conta real).
+
+    python bench/run.py                      # tudo (envio só se houver Chrome/ChromeDriver)
+    python bench/run.py --sem-navegador      # apenas preparação e micro-benchmarks
+    python bench/run.py --tamanhos 10,1000 --max-envios 50 --latencia 20
+
+Mede:
+  - inicialização: tempo de import de sender.py, main.py e módulos auxiliares (-X importtime)
+  - preparação dos contatos (leitura do xlsx + preparar_contatos) para planilhas de 10/1k/10k linhas
+  - o loop real de envio (sender.enviar_campanha) contra a página falsa em localhost:
+    contatos/minuto, percentis de latência por fase e pico de memória do Python (acumulado desde o início)
+  - micro-benchmarks do painel: StatsCache.get() e LogTailer.read_new()
+  - abertura do Chrome no modo portável (até a lista de conversas) sem cache, com o cache
+    de arquivos vazio e com ele já preenchido (ASSET_CACHE)
+  - memória (RSS) e CPU do Chrome (todos os processos) enviando com o modo padrão e com o modo
+    leve (LEAN_BROWSER), contra uma página com fotos de perfil e fonte web
+"""
+import argparse
+import itertools
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from metricas import FASES
+
+
+def percentil(valores, p):
+    if not valores:
+        return float('nan')
+    valores = sorted(valores)
+    k = (len(valores) - 1) * p / 100
+    i = int(k)
+    j = min(i + 1, len(valores) - 1)
+    return valores[i] + (valores[j] - valores[i]) * (k - i)
+
+
+def medir(fn, repeticoes=1):
+    """Executa `fn` e retorna (resultado, segundos por execução)."""
+    inicio = time.perf_counter()
+    for _ in range(repeticoes):
+        resultado = fn()
+    return resultado, (time.perf_counter() - inicio) / repeticoes
+
+
+def pico_rss_mb():
+    """Pico de RSS do processo do benchmark desde o início (acumulado: nunca diminui)."""
+    try:
+        import resource
+    except ImportError:
+        return float('nan')
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux informa em KiB, macOS em bytes
+    return rss / (1024 * 1024) if sys.platform == 'darwin' else rss / 1024
+
+
+def processos_chrome(pid):
+    """PIDs do processo `pid` (o chromedriver) e de todos os seus descendentes (Linux: /proc)."""
+    filhos = {}
+    for nome in os.listdir('/proc'):
+        if not nome.isdigit():
+            continue
+        try:
+            with open(f'/proc/{nome}/stat', 'rb') as f:
+                # O nome do processo pode ter espaços: os campos começam após o último ')'
+                campos = f.read().rsplit(b')', 1)[1].split()
+        except OSError:
+            continue
+        filhos.setdefault(int(campos[1]), []).append(int(nome))
+    pids, pendentes = [], [pid]
+    while pendentes:
+        atual = pendentes.pop()
+        pids.append(atual)
+        pendentes.extend(filhos.get(atual, ()))
+    return pids
+
+
+def recursos_chrome(pid):
+    """
+    (RSS somado em MB, segundos de CPU acumulados) do chromedriver e do Chrome.
+    Usa psutil se estiver instalado; senão lê /proc (Linux). NaN se nenhum dos dois existir.
+    O RSS somado conta mais de uma vez as páginas compartilhadas entre os processos.
+    """
+    try:
+        import psutil
+    except ImportError:
+        psutil = None
+    if psutil is not None:
+        try:
+            raiz = psutil.Process(pid)
+            processos = [raiz] + raiz.children(recursive=True)
+        except psutil.Error:
+            return float('nan'), float('nan')
+        rss = cpu = 0.0
+        for p in processos:
+            try:
+                rss += p.memory_info().rss
+                tempos = p.cpu_times()
+                cpu += tempos.user + tempos.system
+            except psutil.Error:
+                pass
+        return rss / (1024 * 1024), cpu
+    if not os.path.isdir('/proc'):
+        return float('nan'), float('nan')
+    pagina = os.sysconf('SC_PAGE_SIZE')
+    ticks = os.sysconf('SC_CLK_TCK')
+    rss = cpu = 0.0
+    for p in processos_chrome(pid):
+        try:
+            with open(f'/proc/{p}/stat', 'rb') as f:
+                campos = f.read().rsplit(b')', 1)[1].split()
+        except OSError:
+            continue
+        # Após o ')': utime e stime são os campos 12 e 13, rss (em páginas) o 22
+        cpu += (int(campos[11]) + int(campos[12])) / ticks
+        rss += int(campos[21]) * pagina
+    return rss / (1024 * 1024), cpu
+
+
+def gerar_planilha(path, linhas, invalidos=0.0):
+    """
+    Gera uma planilha de contatos sintética (.xlsx ou .csv, pela extensão), sem números repetidos.
+    Uma fração `invalidos` termina em 0000 (número inexistente na página falsa); esses usam
+    DDDs 11 a 37, para não coincidirem entre si nem com os válidos (DDD 38, nunca terminam em 0000).
+    """
+    import pandas as pd
+    passo = int(1 / invalidos) if invalidos else 0
+    numeros = []
+    for i in range(linhas):
+        if passo and i % passo == passo - 1:
+            numeros.append(f'({11 + i // 10000 % 27}) 9{i % 10000:04d}-0000')
+        else:
+            numeros.append(f'(38) 9{i // 9999 % 10000:04d}-{i % 9999 + 1:04d}')
+    df = pd.DataFrame({'nome': [f'Contato {i}' for i in range(linhas)], 'telefone': numeros})
+    if path.endswith('.csv'):
+        df.to_csv(path, index=False)
+    else:
+        df.to_excel(path, index=False)
+
+
+def titulo(texto):
+    print(f"\n{'=' * 72}\n{texto}\n{'=' * 72}")
+
+
+def tempos_de_import(modulo):
+    """
+    Importa `modulo` em um processo novo com `-X importtime`.
+    Retorna (segundos de relógio do processo, segundos do import do módulo,
+    {pacote importado diretamente pelo módulo: segundos acumulados}).
+    """
+    inicio = time.perf_counter()
+    r = subprocess.run([sys.executable, '-X', 'importtime', '-c', f'import {modulo}'],
+                       cwd=ROOT, capture_output=True, text=True)
+    relogio = time.perf_counter() - inicio
+    total = 0.0
+    pacotes = {}
+    diretos = []
+    for linha in r.stderr.splitlines():
+        if not linha.startswith('import time:') or '|' not in linha:
+            continue
+        _, acumulado, nome = linha.split('|', 2)
+        if not acumulado.strip().isdigit():
+            continue  # cabeçalho
+        # O recuo do nome indica a profundidade: 0 = o próprio módulo, 1 = seus imports diretos
+        profundidade = (len(nome) - len(nome.lstrip()) - 1) // 2
+        segundos = int(acumulado) / 1e6
+        # Cada import aparece depois dos que ele fez: os de profundidade 1 que antecedem
+        # a linha do módulo são dele; os que antecedem outra linha de profundidade 0, não
+        if profundidade == 1:
+            diretos.append((nome.strip().split('.')[0], segundos))
+        elif profundidade == 0:
+            if nome.strip() == modulo:
+                total = segundos
+                for raiz, seg in diretos:
+                    pacotes[raiz] = pacotes.get(raiz, 0) + seg
+            diretos = []
+    return relogio, total, pacotes
+
+
+def bench_inicializacao(modulos=('contatos', 'stats', 'sender', 'main')):
+    titulo('Inicialização: tempo de import de cada ponto de entrada (-X importtime)')
+    print(f"{'módulo':<10} {'processo (ms)':>14} {'import (ms)':>12}  maiores imports diretos")
+    for modulo in modulos:
+        relogio, total, pacotes = tempos_de_import(modulo)
+        maiores = sorted(pacotes.items(), key=lambda item: item[1], reverse=True)[:5]
+        detalhe = ', '.join(f'{nome} {seg * 1000:.0f}' for nome, seg in maiores)
+        print(f"{modulo:<10} {relogio * 1000:>14.0f} {total * 1000:>12.0f}  {detalhe}")
+
+
+def bench_preparacao(tmp, tamanhos):
+    import pandas as pd
+    from contatos import preparar_contatos, preparar_em_blocos
+
+    template = 'Olá {nome}, tudo bem?'
+    titulo('Preparação dos contatos: planilha inteira (pd.read_excel) x leitura em blocos')
+    print(f"{'linhas':>8} {'modo':>8} {'1º contato (s)':>15} {'total (s)':>10} {'contatos/s':>12} {'pico mem (MB)':>14}")
+    for n in tamanhos:
+        for ext in ('xlsx', 'csv'):
+            path = os.path.join(tmp, f'contatos_{n}.{ext}')
+            gerar_planilha(path, n)
+
+        def inteira():
+            df = pd.read_excel(os.path.join(tmp, f'contatos_{n}.xlsx'), dtype=str)
+            return preparar_contatos(df, template, 'https://exemplo.com')
+
+        def em_blocos(ext):
+            def executar():
+                primeiro = None
+                inicio = time.perf_counter()
+                for validos, _ in preparar_em_blocos(os.path.join(tmp, f'contatos_{n}.{ext}'), template, 'https://exemplo.com'):
+                    if primeiro is None and len(validos):
+                        primeiro = time.perf_counter() - inicio
+                return primeiro
+            return executar
+
+        for modo, fn in (('inteira', inteira), ('xlsx', em_blocos('xlsx')), ('csv', em_blocos('csv'))):
+            tracemalloc.start()
+            resultado, duracao = medir(fn)
+            pico = tracemalloc.get_traced_memory()[1] / (1024 * 1024)
+            tracemalloc.stop()
+            primeiro = duracao if modo == 'inteira' else (resultado or 0)
+            taxa = n / duracao if n else 0
+            print(f"{n:>8} {modo:>8} {primeiro:>15.3f} {duracao:>10.3f} {taxa:>12.0f} {pico:>14.1f}")
+
+
+def bench_envio(tmp, tamanhos, max_envios, latencia, nav_mode, invalidos):
+    # Configuração do sender antes de importá-lo (lida no import)
+    os.environ.setdefault('SEND_MIN_INTERVAL', '0')
+    os.environ['NAV_MODE'] = nav_mode
+    from fake_whatsapp import FakeWhatsApp
+
+    titulo(f'Envio contra a página falsa (NAV_MODE={nav_mode}, latência {latencia} ms por fase)')
+    with FakeWhatsApp(latencia, latencia, latencia) as fake:
+        os.environ['WHATSAPP_URL'] = fake.url
+        import sender
+        from sent_store import SentStore
+
+        # Não misturar o cache de seletores do benchmark com o real
+        sender.campo_mensagem.path = os.path.join(tmp, 'selectors.json')
+        try:
+            driver, temp_profile = sender.iniciar_driver(False, headless=True)
+        except Exception as e:
+            print(f"[PULADO] Chrome/ChromeDriver indisponível: {e}")
+            return
+        try:
+            if not sender.aguardar_login(driver, False):
+                print("[PULADO] A página falsa não ficou pronta")
+                return
+            for n in tamanhos:
+                path = os.path.join(tmp, f'envio_{n}.xlsx')
+                gerar_planilha(path, n, invalidos)
+                store = SentStore(os.path.join(tmp, f'envios_{n}.db'))
+                sender.CONTATOS_FILE = path
+                campanha = sender.preparar_campanha({'template': 'Olá {nome}, tudo bem?'}, store)
+                campanha['contatos'] = itertools.islice(campanha['contatos'], max_envios)
+
+                tempos = {fase: [] for fase in FASES}
+                resultados = {'contato_ok': 0, 'contato_falha': 0}
+
+                def coletar(evento, **dados):
+                    if evento == 'intervalo':
+                        tempos['espera'].append(dados['segundos'])
+                    if evento in resultados:
+                        resultados[evento] += 1
+                        for fase, valor in (dados.get('tempos') or {}).items():
+                            if fase in tempos:
+                                tempos[fase].append(valor)
+
+                _, duracao = medir(lambda: sender.enviar_campanha(driver, campanha, store, coletar))
+                store.close()
+
+                processados = resultados['contato_ok'] + resultados['contato_falha']
+                print(f"\n{n} linhas ({min(n, max_envios)} enviados pelo navegador): "
+                      f"{processados / duracao * 60:.1f} contatos/min | "
+                      f"ok={resultados['contato_ok']} falhas={resultados['contato_falha']} | "
+                      f"pico RSS do Python desde o início do benchmark {pico_rss_mb():.0f} MB")
+                print(f"  {'fase':<14} {'p50 (ms)':>10} {'p90 (ms)':>10} {'p99 (ms)':>10} {'n':>6}")
+                for fase in FASES:
+                    v = tempos[fase]
+                    print(f"  {fase:<14} {percentil(v, 50) * 1000:>10.0f} {percentil(v, 90) * 1000:>10.0f} "
+                          f"{percentil(v, 99) * 1000:>10.0f} {len(v):>6}")
+        finally:
+            sender.encerrar_driver(driver, temp_profile)
+
+
+def bench_abertura(tmp, latencia, bundle_kb, bundle_ms, repeticoes=3):
+    """Tempo de iniciar_driver + aguardar_login no modo portável, com e sem cache de arquivos."""
+    from fake_whatsapp import FakeWhatsApp
+
+    titulo(f'Abertura no modo portável (pacote JS de {bundle_kb} KiB, {bundle_ms} ms para baixar)')
+    with FakeWhatsApp(latencia, latencia, latencia, bundle_kb=bundle_kb, bundle_ms=bundle_ms) as fake:
+        os.environ['WHATSAPP_URL'] = fake.url
+        import sender
+        # O sender pode já ter sido importado por outro benchmark (com a URL de outro servidor)
+        sender.WHATSAPP_URL = fake.url
+
+        def abrir(cache_dir, limpar=False):
+            if limpar:
+                shutil.rmtree(cache_dir, ignore_errors=True)
+            inicio = time.perf_counter()
+            driver, temp_profile = sender.iniciar_driver(False, headless=True, cache_dir=cache_dir)
+            try:
+                if not sender.aguardar_login(driver, False):
+                    raise RuntimeError('a página falsa não ficou pronta')
+                return time.perf_counter() - inicio
+            finally:
+                sender.encerrar_driver(driver, temp_profile, cache_dir)
+
+        cache_dir = os.path.join(tmp, 'cache')
+        casos = [('sem cache', lambda: abrir(None)),
+                 ('cache vazio', lambda: abrir(cache_dir, limpar=True)),
+                 ('cache preenchido', lambda: abrir(cache_dir))]
+        print(f"{'caso':<18} {'p50 (s)':>9} {'máx (s)':>9} {'downloads/abertura':>20}")
+        for nome, fn in casos:
+            tempos = []
+            antes = fake.downloads
+            try:
+                for _ in range(repeticoes):
+                    tempos.append(fn())
+            except Exception as e:
+                print(f"[PULADO] Chrome/ChromeDriver indisponível: {e}")
+                return
+            print(f"{nome:<18} {percentil(tempos, 50):>9.2f} {max(tempos):>9.2f} "
+                  f"{(fake.downloads - antes) / repeticoes:>20.1f}")
+
+
+def bench_recursos(tmp, latencia, contatos, avatares, nav_mode):
+    """RSS e CPU do Chrome durante uma campanha, no modo padrão e no modo leve."""
+    os.environ.setdefault('SEND_MIN_INTERVAL', '0')
+    os.environ['NAV_MODE'] = nav_mode
+    from fake_whatsapp import FakeWhatsApp
+
+    titulo(f'Recursos do Chrome: modo padrão x leve ({contatos} contatos, {avatares} fotos de perfil, NAV_MODE={nav_mode})')
+    with FakeWhatsApp(latencia, latencia, latencia, avatares=avatares) as fake:
+        os.environ['WHATSAPP_URL'] = fake.url
+        import sender
+        from sent_store import SentStore
+
+        # O sender pode já ter sido importado por outro benchmark: a configuração lida no
+        # import (URL de outro servidor, outro NAV_MODE) é sobrescrita aqui
+        sender.WHATSAPP_URL = fake.url
+        sender.NAV_MODE = nav_mode
+        sender.MIN_INTERVAL = float(os.environ['SEND_MIN_INTERVAL'])
+
+        sender.campo_mensagem.path = os.path.join(tmp, 'selectors.json')
+        path = os.path.join(tmp, 'recursos.xlsx')
+        gerar_planilha(path, contatos)
+        sender.CONTATOS_FILE = path
+        print(f"{'modo':<8} {'RSS pico (MB)':>14} {'RSS final (MB)':>15} {'CPU (s)':>9} {'CPU média':>10} "
+              f"{'contatos/min':>13} {'mídia baixada':>14}")
+        for lean in (False, True):
+            try:
+                driver, temp_profile = sender.iniciar_driver(False, headless=True, lean=lean)
+            except Exception as e:
+                print(f"[PULADO] Chrome/ChromeDriver indisponível: {e}")
+                return
+            try:
+                pid = driver.service.process.pid
+                if not sender.aguardar_login(driver, False):
+                    print("[PULADO] A página falsa não ficou pronta")
+                    return
+                store = SentStore(os.path.join(tmp, f'recursos_{int(lean)}.db'))
+                campanha = sender.preparar_campanha({'template': 'Olá {nome}, tudo bem?'}, store)
+                midia_antes = fake.midia
+                _, cpu_antes = recursos_chrome(pid)
+                # Pico de RSS amostrado a cada contato enviado
+                amostras = []
+
+                def amostrar(evento, **dados):
+                    if evento in ('contato_ok', 'contato_falha'):
+                        amostras.append(recursos_chrome(pid)[0])
+
+                _, duracao = medir(lambda: sender.enviar_campanha(driver, campanha, store, amostrar))
+                store.close()
+                rss, cpu_depois = recursos_chrome(pid)
+                cpu = cpu_depois - cpu_antes
+                pico = max(amostras + [rss])
+                print(f"{'leve' if lean else 'padrão':<8} {pico:>14.0f} {rss:>15.0f} {cpu:>9.1f} "
+                      f"{cpu / duracao * 100:>9.0f}% {len(amostras) / duracao * 60:>13.1f} "
+                      f"{fake.midia - midia_antes:>14}")
+            finally:
+                sender.encerrar_driver(driver, temp_profile)
+
+
+def bench_painel(tmp, linhas_envios=100000, log_mb=20):
+    import pandas as pd
+    from log_tail import LogTailer
+    from sent_store import SentStore
+    from stats import StatsCache
+
+    titulo('Micro-benchmarks do painel (main.py)')
+
+    # get_stats: planilha de 1k linhas + banco com muitos envios
+    contatos = os.path.join(tmp, 'painel_contatos.xlsx')
+    gerar_planilha(contatos, 1000)
+    db = os.path.join(tmp, 'painel_envios.db')
+    store = SentStore(db, batch_size=10000)
+    for i in range(linhas_envios):
+        store.registrar(f'55389{i:08d}', 'Olá', 'ok' if i % 10 else 'erro')
+    store.close()
+
+    cache = StatsCache(contatos, db)
+    _, frio = medir(cache.get)
+    _, recontagem = medir(cache._count_contatos)
+    _, quente = medir(cache.get, repeticoes=1000)
+    _, ingenuo = medir(lambda: len(pd.read_excel(contatos, dtype=str)), repeticoes=3)
+    print(f"StatsCache.get() ({linhas_envios} envios, 1k contatos): primeira {frio * 1000:.1f} ms "
+          f"(recontagem em segundo plano {recontagem * 1000:.1f} ms) | em cache {quente * 1e6:.1f} µs | "
+          f"read_excel a cada chamada {ingenuo * 1000:.1f} ms")
+
+    # Log: arquivo grande, leitura das últimas 150 linhas e depois só das novas
+    log = os.path.join(tmp, 'system.log')
+    linha = '[DEBUG] Abrindo URL do WhatsApp... ' + 'x' * 60 + '\n'
+    with open(log, 'w', encoding='utf-8') as f:
+        f.write(linha * (log_mb * 1024 * 1024 // len(linha)))
+
+    def ler_tudo():
+        with open(log, 'r', encoding='utf-8') as f:
+            return f.read().splitlines()[-150:]
+
+    tailer = LogTailer(log, initial_lines=150)
+    _, inicial = medir(tailer.read_new)
+    with open(log, 'a', encoding='utf-8') as f:
+        f.write(linha * 100)
+    _, incremental = medir(tailer.read_new)
+    _, ocioso = medir(tailer.read_new, repeticoes=1000)
+    _, completo = medir(ler_tudo, repeticoes=3)
+    print(f"LogTailer ({log_mb} MB): últimas 150 linhas {inicial * 1000:.2f} ms | 100 linhas novas "
+          f"{incremental * 1000:.2f} ms | sem novidades {ocioso * 1e6:.1f} µs | "
+          f"leitura completa (antigo) {completo * 1000:.1f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark offline do Bot WhatsApp')
+    parser.add_argument('--tamanhos', default='10,1000,10000', help='tamanhos das planilhas sintéticas')
+    parser.add_argument('--max-envios', type=int, default=100, help='máximo de contatos enviados pelo navegador por tamanho')
+    parser.add_argument('--latencia', type=int, default=50, help='latência da página falsa por fase (ms)')
+    parser.add_argument('--nav', default='url', choices=('url', 'app'), help='NAV_MODE do sender')
+    parser.add_argument('--invalidos', type=float, default=0.0, help='fração de números inexistentes (0 a 1)')
+    parser.add_argument('--sem-navegador', action='store_true', help='não executa o envio com Chrome')
+    parser.add_argument('--bundle-kb', type=int, default=2048, help='tamanho do pacote JS da página falsa na abertura (KiB)')
+    parser.add_argument('--bundle-ms', type=int, default=300, help='tempo para baixar o pacote JS (ms)')
+    parser.add_argument('--recursos-contatos', type=int, default=50, help='contatos enviados na comparação modo padrão x leve')
+    parser.add_argument('--avatares', type=int, default=40, help='fotos de perfil na página falsa na comparação modo padrão x leve')
+    args = parser.parse_args()
+    tamanhos = [int(t) for t in args.tamanhos.split(',') if t.strip()]
+
+    tmp = tempfile.mkdtemp(prefix='whatsapp_bench_')
+    try:
+        bench_inicializacao()
+        bench_preparacao(tmp, tamanhos)
+        bench_painel(tmp)
+        if not args.sem_navegador:
+            bench_envio(tmp, tamanhos, args.max_envios, args.latencia, args.nav, args.invalidos)
+            bench_abertura(tmp, args.latencia, args.bundle_kb, args.bundle_ms)
+            bench_recursos(tmp, args.latencia, args.recursos_contatos, args.avatares, args.nav)
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,346 @@
+import os
+import re
+import sqlite3
+import threading
+import time
+
+from contatos import normalizar_numero
+from log_tail import LogTailer
+
+# Índice do system.log para a busca do painel (data/busca.db).
+# Cada linha do log vira um registro com data/hora, nível ([OK], [ERRO], ...) e o
+# contato a que pertence; os contatos ficam numa tabela à parte, indexada por número.
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS log_contatos (
+    id INTEGER PRIMARY KEY,
+    numero TEXT NOT NULL,
+    nome TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_log_contatos_numero ON log_contatos(numero);
+CREATE TABLE IF NOT EXISTS log_linhas (
+    id INTEGER PRIMARY KEY,
+    ts TEXT NOT NULL,
+    nivel TEXT,
+    contato INTEGER,
+    texto TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_log_linhas_ts ON log_linhas(ts);
+CREATE INDEX IF NOT EXISTS idx_log_linhas_contato ON log_linhas(contato);
+CREATE INDEX IF NOT EXISTS idx_log_linhas_nivel ON log_linhas(nivel);
+CREATE TABLE IF NOT EXISTS log_posicao (
+    id INTEGER PRIMARY KEY CHECK (id = 1),
+    dev INTEGER,
+    ino INTEGER,
+    offset INTEGER,
+    contato INTEGER
+);
+"""
+
+# "[3/120] Enviando para: Maria (5511987654321)" abre o trecho do contato
+INICIO_CONTATO = re.compile(r'^\[\d+/\d+\] Enviando para: (.*) \((\d+)\)$')
+# "[ERRO] Linha 7: Número inválido (Maria: 1234)" - linha rejeitada na preparação
+LINHA_REJEITADA = re.compile(r'^\[ERRO\] Linha \d+: .* \((.*): (\d*|-)\)$')
+# "[OK] ...", "[ERRO] ..." ou "ERRO: ..."
+NIVEL = re.compile(r'^\[([A-Z]+)\]|^([A-Z]+):')
+# Linhas que encerram a campanha (as seguintes não pertencem ao último contato)
+FIM_CAMPANHA = ('[CONCLUIDO]', '[PRE-VERIFICACAO]', '[WORKER]')
+
+# Status da busca -> níveis das linhas do log
+NIVEIS_STATUS = {'ok': ('OK',), 'erro': ('ERRO', 'FALHA')}
+
+POR_PAGINA = 50
+
+# Intervalo (segundos) entre as limpezas das linhas mais antigas que `dias`
+INTERVALO_LIMPEZA = 3600
+
+# Formatos aceitos nos filtros de data e o que falta para o início/fim do intervalo
+FORMATOS_DATA = (
+    ('%Y-%m-%d %H:%M:%S', ('', '')),
+    ('%Y-%m-%d %H:%M', (':00', ':59')),
+    ('%Y-%m-%d', (' 00:00:00', ' 23:59:59')),
+)
+
+
+def criar_indice_texto(conn, tabela, colunas):
+    """
+    Cria (se ainda não existir) a tabela FTS5 `<tabela>_texto`, com tokenizador trigram,
+    sobre as `colunas` de `tabela`, mantida por gatilhos. Na criação indexa as linhas
+    que já existem. Retorna o nome da tabela, ou None se o SQLite não tiver FTS5/trigram
+    (a busca por trecho continua com LIKE).
+    """
+    texto = f'{tabela}_texto'
+    if _tem_tabela(conn, texto):
+        return texto
+    campos = ', '.join(colunas)
+    novos = ', '.join(f'new.{c}' for c in colunas)
+    antigos = ', '.join(f'old.{c}' for c in colunas)
+    apagar = f"INSERT INTO {texto} ({texto}, rowid, {campos}) VALUES ('delete', old.id, {antigos});"
+    inserir = f'INSERT INTO {texto} (rowid, {campos}) VALUES (new.id, {novos});'
+    try:
+        conn.execute(f"CREATE VIRTUAL TABLE {texto} USING fts5({campos}, content='{tabela}', "
+                     f"content_rowid='id', tokenize='trigram')")
+    except sqlite3.OperationalError:
+        return None
+    with conn:
+        conn.execute(f'CREATE TRIGGER IF NOT EXISTS {texto}_ai AFTER INSERT ON {tabela} BEGIN {inserir} END')
+        conn.execute(f'CREATE TRIGGER IF NOT EXISTS {texto}_ad AFTER DELETE ON {tabela} BEGIN {apagar} END')
+        conn.execute(f'CREATE TRIGGER IF NOT EXISTS {texto}_au AFTER UPDATE OF {campos} ON {tabela} '
+                     f'BEGIN {apagar} {inserir} END')
+        conn.execute(f"INSERT INTO {texto} ({texto}) VALUES ('rebuild')")
+    return texto
+
+
+def _tem_tabela(conn, nome):
+    return conn.execute("SELECT 1 FROM sqlite_master WHERE name = ?", (nome,)).fetchone() is not None
+
+
+def _filtros_contato(numero, nome, texto=None):
+    """
+    Condições de número e nome sobre uma tabela com colunas id, numero e nome.
+    Número completo (normalizado como na planilha) usa o índice de número; trechos
+    com 3 ou mais caracteres usam o índice trigram `texto`; trechos menores (ou sem
+    o índice) caem no LIKE. Retorna (condicoes, args).
+    """
+    condicoes, args, trechos = [], [], []
+    numero = normalizar_numero(numero or '')
+    if len(numero) >= 12:
+        condicoes.append('numero = ?')
+        args.append(numero)
+    elif numero:
+        trechos.append(('numero', numero))
+    nome = (nome or '').strip()
+    if nome:
+        trechos.append(('nome', nome))
+
+    consulta = []
+    for coluna, valor in trechos:
+        if texto and len(valor) >= 3:
+            consulta.append(f'{coluna} : "{valor.replace(chr(34), chr(34) * 2)}"')
+        else:
+            condicoes.append(f"{coluna} LIKE ? ESCAPE '\\'")
+            args.append(f'%{_escapar_like(valor)}%')
+    if consulta:
+        condicoes.append(f'id IN (SELECT rowid FROM {texto} WHERE {texto} MATCH ?)')
+        args.append(' AND '.join(consulta))
+    return condicoes, args
+
+
+def _escapar_like(texto):
+    return texto.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+
+
+def intervalo_datas(inicio, fim):
+    """
+    Converte 'AAAA-MM-DD' (ou 'AAAA-MM-DD HH:MM') nos limites comparáveis com `ts`:
+    o início vale desde o primeiro segundo e o fim até o último.
+    Levanta ValueError se alguma data for inválida.
+    """
+    limites = []
+    for valor, lado in ((inicio, 0), (fim, 1)):
+        valor = (valor or '').strip()
+        if not valor:
+            limites.append(None)
+            continue
+        for formato, complemento in FORMATOS_DATA:
+            try:
+                data = time.strptime(valor, formato)
+            except ValueError:
+                continue
+            limites.append(time.strftime(formato, data) + complemento[lado])
+            break
+        else:
+            raise ValueError(f'data inválida: {valor} (use AAAA-MM-DD)')
+    return tuple(limites)
+
+
+def buscar_envios(conn, numero=None, nome=None, status=None, inicio=None, fim=None,
+                  pagina=0, por_pagina=POR_PAGINA):
+    """
+    Busca no histórico de envios (envios.db) usando os índices de número, nome, status e data.
+    O índice de nome/número (envios_texto) é criado pelo SentStore; em bancos ainda sem ele
+    a busca por trecho lê a tabela inteira.
+    Retorna (total, linhas), com as linhas mais recentes primeiro.
+    """
+    texto = 'envios_texto' if _tem_tabela(conn, 'envios_texto') else None
+    condicoes, args = _filtros_contato(numero, nome, texto)
+    if status in NIVEIS_STATUS:
+        condicoes.append('status = ?')
+        args.append(status)
+    inicio, fim = intervalo_datas(inicio, fim)
+    if inicio:
+        condicoes.append('ts >= ?')
+        args.append(inicio)
+    if fim:
+        condicoes.append('ts <= ?')
+        args.append(fim)
+    where = f"WHERE {' AND '.join(condicoes)}" if condicoes else ''
+
+    total = conn.execute(f'SELECT COUNT(*) FROM envios {where}', args).fetchone()[0]
+    linhas = conn.execute(
+        f'SELECT ts, linha, nome, numero, status, erro, t_total FROM envios {where} '
+        f'ORDER BY id DESC LIMIT ? OFFSET ?', args + [por_pagina, pagina * por_pagina]).fetchall()
+    return total, linhas
+
+
+class IndiceLog:
+    """
+    Índice incremental do system.log em SQLite, para buscas por número, nome, nível e data.
+    A cada atualização lê apenas os bytes novos do log (LogTailer) e guarda a posição
+    no próprio banco, na mesma transação das linhas: ao reabrir o painel a indexação
+    continua de onde parou, inclusive se o log tiver sido rotacionado nesse meio tempo.
+    As linhas recebem a data/hora em que foram indexadas; as que já estavam no log
+    na criação do índice recebem a data da última alteração do arquivo.
+    Linhas mais antigas que `dias` são apagadas ao abrir e depois a cada INTERVALO_LIMPEZA.
+    """
+
+    def __init__(self, path, log_path, backups=3, dias=180):
+        self.path = path
+        self.log_path = log_path
+        self.backups = backups
+        self.dias = dias
+        self._lock = threading.Lock()
+        self._conn = None
+        self._tailer = None
+        self._contato = None
+        self._texto = None
+        self._limpeza = 0.0
+
+    def _abrir(self):
+        conn = sqlite3.connect(self.path, check_same_thread=False)
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.execute('PRAGMA synchronous=NORMAL')
+        conn.executescript(SCHEMA)
+        self._texto = criar_indice_texto(conn, 'log_contatos', ('nome', 'numero'))
+        self._conn = conn
+        self._tailer = LogTailer(self.log_path)
+
+        posicao = conn.execute('SELECT dev, ino, offset, contato FROM log_posicao').fetchone()
+        if posicao is None:
+            # Primeiro uso: indexar as cópias rotacionadas (da mais antiga) e depois o log atual.
+            # Se o log ainda não existir, ele será lido desde o início quando for criado.
+            self._tailer.offset = 0
+            for n in range(self.backups, 0, -1):
+                self._indexar_arquivo(f'{self.log_path}.{n}')
+            self._indexar_arquivo(self.log_path, posicionar=True)
+        else:
+            dev, ino, offset, self._contato = posicao
+            self._tailer.file_id = (dev, ino)
+            self._tailer.offset = offset
+            self._apagar_antigos()
+
+    def _indexar_arquivo(self, path, posicionar=False):
+        """Indexa um arquivo inteiro com a data da sua última alteração."""
+        try:
+            with open(path, 'rb') as f:
+                st = os.fstat(f.fileno())
+                dados = f.read()
+        except OSError:
+            return
+        linhas = dados.split(b'\n')
+        parcial = linhas.pop()
+        ts = time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(st.st_mtime))
+        with self._conn:
+            self._inserir(ts, [l.rstrip(b'\r').decode('utf-8', errors='replace') for l in linhas])
+            if posicionar:
+                # Uma linha incompleta no fim será lida de novo quando terminar de ser escrita
+                self._tailer.file_id = (st.st_dev, st.st_ino)
+                self._tailer.offset = len(dados) - len(parcial)
+                self._salvar_posicao()
+
+    def _apagar_antigos(self):
+        self._limpeza = time.monotonic()
+        if not self.dias:
+            return
+        limite = time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(time.time() - self.dias * 86400))
+        with self._conn:
+            self._conn.execute('DELETE FROM log_linhas WHERE ts < ?', (limite,))
+            self._conn.execute('DELETE FROM log_contatos WHERE id < (SELECT COALESCE(MIN(contato), 0) '
+                               'FROM log_linhas WHERE contato IS NOT NULL)')
+
+    def _novo_contato(self, nome, numero):
+        return self._conn.execute('INSERT INTO log_contatos (numero, nome) VALUES (?, ?)',
+                                  (numero, nome)).lastrowid
+
+    def _inserir(self, ts, linhas):
+        registros = []
+        for texto in linhas:
+            if not texto.strip():
+                continue
+            contato = self._contato
+            m = INICIO_CONTATO.match(texto)
+            if m:
+                contato = self._contato = self._novo_contato(m.group(1), m.group(2))
+            elif texto.startswith(FIM_CAMPANHA) or texto.startswith('='):
+                contato = self._contato = None
+            else:
+                m = LINHA_REJEITADA.match(texto)
+                if m and m.group(2) not in ('', '-'):
+                    contato = self._novo_contato(m.group(1), m.group(2))
+            m = NIVEL.match(texto)
+            nivel = (m.group(1) or m.group(2)) if m else None
+            registros.append((ts, nivel, contato, texto))
+        self._conn.executemany('INSERT INTO log_linhas (ts, nivel, contato, texto) VALUES (?, ?, ?, ?)',
+                               registros)
+
+    def _salvar_posicao(self):
+        dev, ino = self._tailer.file_id
+        # Bytes de uma linha incompleta ainda não foram indexados: voltar para o início dela
+        offset = self._tailer.offset - len(self._tailer.partial)
+        self._conn.execute('INSERT OR REPLACE INTO log_posicao (id, dev, ino, offset, contato) '
+                           'VALUES (1, ?, ?, ?, ?)', (dev, ino, offset, self._contato))
+
+    def atualizar(self):
+        """Indexa as linhas novas do log. Retorna quantas linhas foram lidas."""
+        with self._lock:
+            if self._conn is None:
+                self._abrir()
+            elif time.monotonic() - self._limpeza >= INTERVALO_LIMPEZA:
+                self._apagar_antigos()
+            _, linhas = self._tailer.read_new()
+            if self._tailer.file_id is None:
+                return 0  # log ainda não existe
+            ts = time.strftime('%Y-%m-%d %H:%M:%S')
+            with self._conn:
+                if linhas:
+                    self._inserir(ts, linhas)
+                self._salvar_posicao()
+            return len(linhas)
+
+    def buscar(self, numero=None, nome=None, status=None, inicio=None, fim=None,
+               pagina=0, por_pagina=POR_PAGINA):
+        """
+        Busca nas linhas indexadas (atualizando o índice antes).
+        Retorna (total, linhas) com (ts, nivel, numero, nome, texto), mais recentes primeiro.
+        """
+        self.atualizar()
+        condicoes, args = [], []
+        contatos, contatos_args = _filtros_contato(numero, nome, self._texto)
+        if contatos:
+            condicoes.append(f"l.contato IN (SELECT id FROM log_contatos WHERE {' AND '.join(contatos)})")
+            args += contatos_args
+        if status in NIVEIS_STATUS:
+            niveis = NIVEIS_STATUS[status]
+            condicoes.append(f"l.nivel IN ({', '.join('?' * len(niveis))})")
+            args += niveis
+        inicio, fim = intervalo_datas(inicio, fim)
+        if inicio:
+            condicoes.append('l.ts >= ?')
+            args.append(inicio)
+        if fim:
+            condicoes.append('l.ts <= ?')
+            args.append(fim)
+        where = f"WHERE {' AND '.join(condicoes)}" if condicoes else ''
+
+        with self._lock:
+            total = self._conn.execute(f'SELECT COUNT(*) FROM log_linhas l {where}', args).fetchone()[0]
+            linhas = self._conn.execute(
+                f'SELECT l.ts, l.nivel, c.numero, c.nome, l.texto FROM log_linhas l '
+                f'LEFT JOIN log_contatos c ON c.id = l.contato {where} '
+                f'ORDER BY l.id DESC LIMIT ? OFFSET ?', args + [por_pagina, pagina * por_pagina]).fetchall()
+        return total, linhas
+
+    def close(self):
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
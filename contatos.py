@@ -0,0 +1,359 @@
+import csv
+import os
+import re
+from string import Formatter
+from urllib.parse import quote
+
+# pandas (~0,3 s de import) é importado dentro das funções que preparam os contatos:
+# o painel usa arquivo_contatos/contar_linhas sem carregá-lo.
+
+# Colunas aceitas para nome e número, em ordem de preferência
+COLUNAS_NOME = ['nome', 'name']
+COLUNAS_NUMERO = ['telefone', 'phone', 'numero']
+
+# Linhas lidas e preparadas por vez: a memória não depende do tamanho da lista
+TAMANHO_BLOCO = 2000
+
+
+def arquivo_contatos(data_dir):
+    """data/contatos.xlsx ou, se não existir, data/contatos.csv (padrão: o .xlsx)."""
+    xlsx = os.path.join(data_dir, 'contatos.xlsx')
+    csv_path = os.path.join(data_dir, 'contatos.csv')
+    if not os.path.exists(xlsx) and os.path.exists(csv_path):
+        return csv_path
+    return xlsx
+
+
+def _eh_csv(path):
+    return path.lower().endswith('.csv')
+
+
+def _texto_celula(valor):
+    """Valor de célula do Excel como texto (números inteiros sem '.0', como o dtype=str do pandas)."""
+    if valor is None:
+        return None
+    if isinstance(valor, float) and valor.is_integer():
+        return str(int(valor))
+    return str(valor)
+
+
+def _separador_csv(path):
+    """Detecta o separador (',' ou ';', comum em planilhas exportadas no Brasil)."""
+    with open(path, 'r', encoding='utf-8-sig', errors='replace', newline='') as f:
+        amostra = f.read(64 * 1024)
+    try:
+        return csv.Sniffer().sniff(amostra, delimiters=',;\t').delimiter
+    except csv.Error:
+        return ','
+
+
+def _linhas_xlsx(ws):
+    """
+    (colunas, linhas) da planilha: o cabeçalho e um gerador de (índice, valores) das linhas de
+    dados, só com as colunas do cabeçalho e sem as linhas em branco. Regra única da leitura
+    (ler_blocos) e da contagem (contar_linhas). Colunas None se a planilha estiver vazia.
+    """
+    # A dimensão gravada no arquivo (<dimension>) pode estar errada; o pandas também a ignora
+    ws.reset_dimensions()
+    linhas = ws.iter_rows(values_only=True)
+    cabecalho = next(linhas, None)
+    if cabecalho is None:
+        return None, iter(())
+    colunas = [str(c) if c is not None else '' for c in cabecalho]
+    largura = len(colunas)
+
+    def dados():
+        for i, linha in enumerate(linhas):
+            valores = [_texto_celula(v) for v in linha[:largura]]
+            if any(valores):
+                yield i, valores + [None] * (largura - len(valores))
+
+    return colunas, dados()
+
+
+def _blocos_xlsx(path, tamanho):
+    import pandas as pd
+    from openpyxl import load_workbook
+
+    wb = load_workbook(path, read_only=True, data_only=True)
+    try:
+        colunas, linhas = _linhas_xlsx(wb.active)
+        if colunas is None:
+            return
+        dados, indices = [], []
+        for i, valores in linhas:
+            dados.append(valores)
+            indices.append(i)
+            if len(dados) >= tamanho:
+                yield pd.DataFrame(dados, columns=colunas, index=indices)
+                dados, indices = [], []
+        if dados:
+            yield pd.DataFrame(dados, columns=colunas, index=indices)
+    finally:
+        wb.close()
+
+
+def _blocos_csv(path, tamanho):
+    import pandas as pd
+
+    leitor = pd.read_csv(path, dtype=str, sep=_separador_csv(path), encoding='utf-8-sig',
+                         encoding_errors='replace', chunksize=tamanho)
+    with leitor:
+        yield from leitor
+
+
+def ler_blocos(path, tamanho=TAMANHO_BLOCO):
+    """
+    Lê a planilha de contatos (.xlsx em modo somente leitura ou .csv) em blocos de
+    `tamanho` linhas. Cada bloco é um DataFrame de texto cujo índice é a linha na
+    planilha (base 0, sem o cabeçalho), como no pd.read_excel(dtype=str).
+    """
+    if _eh_csv(path):
+        return _blocos_csv(path, tamanho)
+    return _blocos_xlsx(path, tamanho)
+
+
+def ler_cabecalho(path):
+    """Nomes das colunas da planilha (minúsculas, sem espaços nas pontas), sem ler os dados."""
+    if _eh_csv(path):
+        with open(path, 'r', encoding='utf-8-sig', errors='replace', newline='') as f:
+            cabecalho = next(csv.reader(f, delimiter=_separador_csv(path)), [])
+    else:
+        from openpyxl import load_workbook
+
+        wb = load_workbook(path, read_only=True)
+        try:
+            cabecalho = next(wb.active.iter_rows(max_row=1, values_only=True), ())
+        finally:
+            wb.close()
+    return [str(c).strip().lower() for c in cabecalho if c is not None]
+
+
+def contar_linhas(path):
+    """
+    Número de linhas de dados (sem o cabeçalho), sem carregar a planilha. No .xlsx percorre
+    todas as linhas (segundos em listas grandes): fora do loop da interface e do envio.
+    """
+    if _eh_csv(path):
+        linhas = 0
+        ultimo = b'\n'
+        with open(path, 'rb') as f:
+            while True:
+                bloco = f.read(1024 * 1024)
+                if not bloco:
+                    break
+                linhas += bloco.count(b'\n')
+                ultimo = bloco[-1:]
+        if ultimo != b'\n':
+            linhas += 1  # última linha sem quebra
+        return max(0, linhas - 1)
+
+    from openpyxl import load_workbook
+    wb = load_workbook(path, read_only=True, data_only=True)
+    try:
+        # A dimensão gravada no arquivo não é confiável (pode faltar, estar errada ou incluir
+        # linhas só formatadas): contar as mesmas linhas que ler_blocos lê
+        _, linhas = _linhas_xlsx(wb.active)
+        return sum(1 for _ in linhas)
+    finally:
+        wb.close()
+
+
+def estimar_linhas(path):
+    """
+    Estimativa imediata do número de linhas de dados, só para exibição: no .xlsx vem da
+    dimensão gravada no arquivo (None se não houver); o .csv é contado (é rápido).
+    A contagem exata é contar_linhas.
+    """
+    if _eh_csv(path):
+        return contar_linhas(path)
+    from openpyxl import load_workbook
+    wb = load_workbook(path, read_only=True)
+    try:
+        max_row = wb.active.max_row
+    finally:
+        wb.close()
+    return max(0, max_row - 1) if max_row else None
+
+
+def _primeira_coluna(df, colunas):
+    """Primeiro valor não vazio entre as colunas existentes (coluna a coluna)."""
+    import pandas as pd
+    resultado = pd.Series('', index=df.index, dtype=object)
+    for coluna in colunas:
+        if coluna not in df.columns:
+            continue
+        valores = df[coluna].fillna('').astype(str).str.strip()
+        resultado = resultado.where(resultado != '', valores)
+    return resultado
+
+
+def normalizar_numeros(numeros):
+    """
+    Limpa os números (espaços, hífens, parênteses, pontos, +) e aplica a regra do
+    código do Brasil (55) para números com 10 ou 11 dígitos.
+    Retorna (numeros_normalizados, validos).
+    """
+    numeros = numeros.str.replace(r'[\s\-().+]', '', regex=True)
+    validos = numeros.str.fullmatch(r'\d{10,}')
+    sem_ddi = validos & numeros.str.len().isin([10, 11])
+    numeros = numeros.where(~sem_ddi, '55' + numeros.str.replace(r'^0', '', regex=True))
+    return numeros, validos
+
+
+def normalizar_numero(numero):
+    """Mesma regra de normalizar_numeros para um único número digitado (sem pandas)."""
+    numero = re.sub(r'[\s\-().+]', '', str(numero))
+    if numero.isdigit() and len(numero) in (10, 11):
+        numero = '55' + (numero[1:] if numero.startswith('0') else numero)
+    return numero
+
+
+def compilar_template(template):
+    """
+    Analisa o template uma única vez. Retorna a lista de partes
+    (literal, campo, formato, conversao), com o campo em minúsculas.
+    Levanta ValueError se o template estiver malformado (chaves sem par).
+    """
+    partes = []
+    for literal, campo, spec, conversao in Formatter().parse(template):
+        if campo is not None:
+            campo = campo.strip().lower()
+            if not campo:
+                raise ValueError('variável vazia "{}" no template')
+        partes.append((literal, campo, spec, conversao))
+    return partes
+
+
+def campos_faltando(partes, colunas):
+    """
+    Variáveis do template que não existem na planilha. {nome} é sempre aceito
+    (vem das colunas de nome); as demais precisam de uma coluna com o mesmo nome.
+    """
+    colunas = {str(c).strip().lower() for c in colunas}
+    return sorted({campo for _, campo, _, _ in partes
+                   if campo is not None and campo != 'nome' and campo not in colunas})
+
+
+def validar_template(path, template):
+    """
+    Compila o template e confere as variáveis contra o cabeçalho da planilha.
+    Retorna (partes, erro): `erro` é None se o template puder ser usado.
+    Erros de leitura da planilha são propagados.
+    """
+    try:
+        partes = compilar_template(template)
+    except ValueError as e:
+        return None, f'Template inválido: {e}'
+    colunas = ler_cabecalho(path)
+    faltando = campos_faltando(partes, colunas)
+    if faltando:
+        return None, (f"A planilha não tem a(s) coluna(s) {', '.join('{' + c + '}' for c in faltando)} "
+                      f"usada(s) na mensagem. Colunas disponíveis: {', '.join(colunas)}")
+    return partes, None
+
+
+def renderizar_mensagens(partes, df, nomes, link=''):
+    """
+    Renderiza o template compilado para todas as linhas de uma vez (concatenação de colunas).
+    {nome} usa o nome já resolvido; qualquer outra variável usa a coluna de mesmo nome de `df`.
+    Levanta KeyError se uma variável não tiver coluna correspondente.
+    """
+    import pandas as pd
+    msgs = pd.Series('', index=nomes.index, dtype=object)
+    for literal, campo, spec, conversao in partes:
+        msgs = msgs + literal
+        if campo is None:
+            continue
+        if campo == 'nome':
+            valores = nomes
+        elif campo in df.columns:
+            valores = df[campo].fillna('').astype(str).str.strip()
+        else:
+            raise KeyError(campo)
+        if spec or conversao:
+            fmt = Formatter()
+            valores = valores.map(lambda v: fmt.format_field(fmt.convert_field(v, conversao), spec))
+        msgs = msgs + valores
+    if link:
+        msgs = msgs + f" Confira: {link}"
+    return msgs
+
+
+def preparar_contatos(df, template, link='', base_url='https://web.whatsapp.com'):
+    """
+    Prepara todos os contatos de uma vez, antes de abrir o navegador.
+    `template` pode ser o texto ou o resultado de compilar_template.
+    Retorna (validos, rejeitados):
+      - validos: colunas linha, nome, numero, msg, url
+      - rejeitados: colunas linha, nome, numero, motivo
+    `linha` é o índice da linha na planilha (base 0).
+    """
+    import pandas as pd
+    df = df.copy()
+    df.columns = df.columns.str.strip().str.lower()
+    nomes = _primeira_coluna(df, COLUNAS_NOME)
+    numeros_brutos = _primeira_coluna(df, COLUNAS_NUMERO)
+    numeros, numero_valido = normalizar_numeros(numeros_brutos)
+
+    motivo = pd.Series('', index=df.index, dtype=object)
+    faltando = (nomes == '') | (numeros_brutos == '')
+    motivo[faltando] = 'Dados inválidos (nome ou número faltando)'
+    motivo[~faltando & ~numero_valido] = 'Número inválido'
+
+    try:
+        partes = compilar_template(template) if isinstance(template, str) else template
+        msgs = renderizar_mensagens(partes, df, nomes, link)
+    except KeyError as e:
+        msgs = pd.Series('', index=df.index, dtype=object)
+        motivo[motivo == ''] = f'Erro no template: variável {e} não encontrada na planilha.'
+    except ValueError as e:
+        msgs = pd.Series('', index=df.index, dtype=object)
+        motivo[motivo == ''] = f'Erro no template: {e}'
+
+    ok = motivo == ''
+    validos = pd.DataFrame({
+        'linha': df.index[ok],
+        'nome': nomes[ok].values,
+        'numero': numeros[ok].values,
+        'msg': msgs[ok].values,
+    })
+    validos['url'] = base_url + '/send?phone=' + validos['numero'] + '&text=' + validos['msg'].map(quote)
+    rejeitados = pd.DataFrame({
+        'linha': df.index[~ok],
+        'nome': nomes[~ok].values,
+        'numero': numeros_brutos[~ok].values,
+        'motivo': motivo[~ok].values,
+    })
+    return validos, rejeitados
+
+
+def preparar_em_blocos(path, template, link='', base_url='https://web.whatsapp.com', tamanho=TAMANHO_BLOCO,
+                       deduplicar=True):
+    """
+    Versão em fluxo de preparar_contatos: lê a planilha bloco a bloco e gera
+    (validos, rejeitados) de cada bloco. O primeiro bloco fica pronto sem esperar
+    a leitura do arquivo inteiro. O template é compilado uma única vez.
+    Com `deduplicar`, um número que já apareceu em uma linha anterior é rejeitado
+    como 'Número duplicado (linha N)' e recebe a mensagem uma única vez.
+    """
+    import pandas as pd
+    partes = compilar_template(template) if isinstance(template, str) else template
+    vistos = {}  # número normalizado -> primeira linha em que apareceu
+    for df in ler_blocos(path, tamanho):
+        validos, rejeitados = preparar_contatos(df, partes, link, base_url)
+        if deduplicar and len(validos):
+            primeira = [vistos.setdefault(numero, linha)
+                        for numero, linha in zip(validos['numero'], validos['linha'])]
+            repetido = [p != linha for p, linha in zip(primeira, validos['linha'])]
+            if any(repetido):
+                dup = validos[repetido]
+                primeira_linha = [p for p, r in zip(primeira, repetido) if r]
+                rejeitados = pd.concat([rejeitados, pd.DataFrame({
+                    'linha': dup['linha'].values,
+                    'nome': dup['nome'].values,
+                    'numero': dup['numero'].values,
+                    'motivo': [f'Número duplicado (linha {p + 1})' for p in primeira_linha],
+                })], ignore_index=True).sort_values('linha', kind='stable')
+                validos = validos[[not r for r in repetido]]
+        yield validos, rejeitados
@@ -0,0 +1,113 @@
+import threading
+import time
+from multiprocessing import AuthenticationError
+from multiprocessing.connection import Client
+
+from worker_ipc import worker_address, worker_authkey
+
+# Eventos de progresso emitidos pelo worker de envio:
+#   campanha_inicio  total, validos, rejeitados, pulados (contagens até o primeiro contato;
+#                    a planilha é lida em blocos durante o envio)
+#   campanha_contagem rejeitados, pulados (acumulados) e total (estimado no início, depois exato),
+#                    quando mudam
+#   contato_inicio   linha, nome, numero
+#   contato_ok       linha, nome, numero, tempos, timeouts
+#   contato_falha    linha, nome, numero, motivo, tipo, tempos, timeouts
+#   intervalo        segundos (espera até o próximo contato)
+#   campanha_pausada linha (próxima linha a enviar)
+#   campanha_retomada linha
+#   campanha_fim     enviados, erros, pulados, total (e parada: linha em que foi interrompida)
+
+
+class EventBus:
+    """Lado do worker: repassa cada evento a todas as conexões inscritas."""
+
+    def __init__(self):
+        self.conns = []
+        self._lock = threading.Lock()
+
+    def inscrever(self, conn):
+        with self._lock:
+            self.conns.append(conn)
+
+    def emitir(self, evento, **dados):
+        dados['evento'] = evento
+        dados['ts'] = time.time()
+        with self._lock:
+            for conn in list(self.conns):
+                try:
+                    conn.send(dados)
+                except (OSError, EOFError):
+                    # Cliente desconectou
+                    self.conns.remove(conn)
+
+
+class EventReader:
+    """
+    Lado do painel: thread que recebe os eventos do worker e chama `on_evento`.
+    Bloqueia em recv() — não custa nada quando não há eventos. Reconecta enquanto
+    `ativo()` for verdadeiro (por exemplo, enquanto o processo do worker existir).
+    """
+
+    def __init__(self, on_evento, ativo, address=None, authkey=None):
+        self.on_evento = on_evento
+        self.ativo = ativo
+        self.address = address or worker_address()
+        self.authkey = authkey or worker_authkey()
+        self.thread = None
+
+    def iniciar(self):
+        if self.thread is None or not self.thread.is_alive():
+            self.thread = threading.Thread(target=self._executar, daemon=True)
+            self.thread.start()
+
+    def _executar(self):
+        while self.ativo():
+            try:
+                conn = Client(self.address, authkey=self.authkey)
+            except (OSError, AuthenticationError):
+                # Worker ainda abrindo o canal
+                time.sleep(0.2)
+                continue
+            try:
+                with conn:
+                    conn.send({'cmd': 'eventos'})
+                    while True:
+                        self.on_evento(conn.recv())
+            except (OSError, EOFError):
+                pass
+
+
+class ProgressoCampanha:
+    """Estado da campanha atual montado a partir dos eventos (consulta sem I/O)."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.estado = {'campanha_ativa': False, 'campanha_total': 0, 'campanha_enviados': 0,
+                       'campanha_falhas': 0, 'campanha_rejeitados': 0, 'campanha_pulados': 0,
+                       'ultimo_erro': ''}
+
+    def aplicar(self, ev):
+        with self._lock:
+            e = self.estado
+            tipo = ev.get('evento')
+            if tipo == 'campanha_inicio':
+                e.update(campanha_ativa=True, campanha_total=ev.get('total', 0),
+                         campanha_enviados=0, campanha_falhas=0,
+                         campanha_rejeitados=ev.get('rejeitados', 0),
+                         campanha_pulados=ev.get('pulados', 0), ultimo_erro='')
+            elif tipo == 'campanha_contagem':
+                e.update(campanha_rejeitados=ev.get('rejeitados', 0), campanha_pulados=ev.get('pulados', 0))
+                if 'total' in ev:
+                    e['campanha_total'] = ev['total']
+            elif tipo == 'contato_ok':
+                e['campanha_enviados'] += 1
+            elif tipo == 'contato_falha':
+                e['campanha_falhas'] += 1
+                e['ultimo_erro'] = f"{ev.get('nome') or ev.get('numero')}: {ev.get('motivo')}"
+            elif tipo == 'campanha_fim':
+                e['campanha_ativa'] = False
+
+    def snapshot(self):
+        with self._lock:
+            return dict(self.estado)
@@ -0,0 +1,101 @@
+import os
+
+
+class LogTailer:
+    """
+    Acompanha um arquivo de log lendo apenas os bytes novos.
+    Guarda o offset já lido e detecta rotação (arquivo substituído) e truncamento.
+    Na rotação, o final ainda não lido do arquivo antigo é buscado em `rotated_path`
+    (padrão: path + '.1', como no RotatingFileHandler) antes de seguir no novo arquivo.
+    """
+
+    def __init__(self, path, initial_lines=150, chunk_size=65536, rotated_path=None):
+        self.path = path
+        self.rotated_path = rotated_path or path + '.1'
+        self.initial_lines = initial_lines
+        self.chunk_size = chunk_size
+        self.offset = None
+        self.file_id = None
+        self.partial = b''
+
+    def reset(self):
+        """Esquece a posição lida; a próxima leitura volta às últimas `initial_lines` linhas."""
+        self.offset = None
+        self.file_id = None
+        self.partial = b''
+
+    def _tail_offset(self, f, size):
+        """Encontra o offset a partir do qual estão as últimas `initial_lines` linhas."""
+        pos = size
+        newlines = 0
+        while pos > 0:
+            step = min(self.chunk_size, pos)
+            pos -= step
+            f.seek(pos)
+            chunk = f.read(step)
+            newlines += chunk.count(b'\n')
+            if newlines > self.initial_lines:
+                # Avançar até o início da primeira linha desejada
+                excess = newlines - self.initial_lines
+                idx = -1
+                for _ in range(excess):
+                    idx = chunk.index(b'\n', idx + 1)
+                return pos + idx + 1
+        return 0
+
+    def _read_rotated(self):
+        """Bytes não lidos do arquivo rotacionado, ou None se ele não for o arquivo que estava sendo lido."""
+        try:
+            with open(self.rotated_path, 'rb') as f:
+                st = os.fstat(f.fileno())
+                if (st.st_dev, st.st_ino) != self.file_id or st.st_size < self.offset:
+                    return None
+                f.seek(self.offset)
+                return f.read()
+        except OSError:
+            return None
+
+    def read_new(self):
+        """
+        Lê as linhas completas adicionadas desde a última chamada.
+        Retorna (reset, linhas): reset=True indica que o arquivo foi rotacionado
+        ou truncado e quem exibe o log deve limpar o que já mostrou.
+        """
+        try:
+            st = os.stat(self.path)
+        except OSError:
+            return False, []
+
+        reset = False
+        rotated = b''
+        file_id = (st.st_dev, st.st_ino)
+        if self.offset is not None and file_id != self.file_id:
+            # Arquivo rotacionado: terminar de ler o antigo (se ainda existir) e seguir no novo
+            rotated = self._read_rotated()
+            if rotated is None:
+                self.partial = b''
+                rotated = b''
+                reset = True
+            self.offset = 0
+        elif self.offset is not None and st.st_size < self.offset:
+            # Arquivo truncado: recomeçar do início
+            self.offset = 0
+            self.partial = b''
+            reset = True
+
+        if self.offset is not None and st.st_size == self.offset and not rotated:
+            self.file_id = file_id
+            return reset, []
+
+        with open(self.path, 'rb') as f:
+            if self.offset is None:
+                self.offset = self._tail_offset(f, st.st_size)
+            f.seek(self.offset)
+            data = f.read()
+        self.file_id = file_id
+        self.offset += len(data)
+
+        data = self.partial + rotated + data
+        lines = data.split(b'\n')
+        self.partial = lines.pop()
+        return reset, [l.rstrip(b'\r').decode('utf-8', errors='replace') for l in lines]
@@ -1,41 +1,210 @@
 import os
 import sys
+import asyncio
+import secrets
+import shutil
+import signal
 import subprocess
+import tempfile
 import threading
-import pandas as pd
-from nicegui import ui
+from nicegui import app, run, ui
+from fastapi.responses import PlainTextResponse
+from log_tail import LogTailer
+from system_log import SystemLog
+from sent_store import SentStore, conectar
+from stats import StatsCache
+from status_poller import StatusPoller
+from worker_ipc import WorkerClient
+from eventos import EventReader, ProgressoCampanha
+from metricas import Metricas
+from contatos import arquivo_contatos, validar_template
+from preflight import formatar_duracao, verificar_campanha
+from busca import POR_PAGINA, IndiceLog, buscar_envios
+from analise import Analise
 
 # Tornar o sistema portável - usar caminhos relativos ao script
 SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
 LOG = os.path.join(SCRIPT_DIR, 'data', 'system.log')
+SENT_DB = os.path.join(SCRIPT_DIR, 'data', 'envios.db')
 SENT_LOG = os.path.join(SCRIPT_DIR, 'data', 'sent_log.csv')
-CONTATOS_FILE = os.path.join(SCRIPT_DIR, 'data', 'contatos.xlsx')
-os.makedirs(os.path.join(SCRIPT_DIR, 'data'), exist_ok=True)
-open(LOG, 'a').close()
+BUSCA_DB = os.path.join(SCRIPT_DIR, 'data', 'busca.db')
+ANALISE_DB = os.path.join(SCRIPT_DIR, 'data', 'analise.db')
+CONTATOS_FILE = arquivo_contatos(os.path.join(SCRIPT_DIR, 'data'))  # contatos.xlsx ou contatos.csv
+# data/system.log com rotação: LOG_MAX_MB por arquivo e LOG_BACKUPS cópias antigas (system.log.1, ...)
+LOG_MAX_MB = float(os.getenv('LOG_MAX_MB', '5'))
+LOG_BACKUPS = int(os.getenv('LOG_BACKUPS', '3'))
+# Dias de log mantidos no índice de busca (data/busca.db); 0 = sem limite
+BUSCA_DIAS = int(os.getenv('BUSCA_DIAS', '180'))
+# Intervalo mínimo entre contatos (mesma variável e padrão do sender.py), usado na estimativa de duração
+MIN_INTERVAL = float(os.getenv('SEND_MIN_INTERVAL', '3'))
+# Espera máxima (segundos) pela parada suave do worker antes de forçar o encerramento
+STOP_TIMEOUT = float(os.getenv('STOP_TIMEOUT', '90'))
 
-proc = None
+# Chave do canal local com o worker de envio (gerada a cada execução do painel)
+os.environ.setdefault('WORKER_AUTHKEY', secrets.token_hex(16))
+worker = WorkerClient()
+
+proc = None  # Processo do worker de envio (sender.py --worker)
+proc_profile = None  # (perfil persistente, cache de arquivos, modo leve) com que o worker foi iniciado
+proc_temp_profile = None  # Perfil temporário do Chrome do worker (modo portável)
 lock = threading.Lock()
+envio_lock = asyncio.Lock()  # Um clique de iniciar por vez (sem bloquear o loop da interface)
+ultimo_status = None  # Última resposta do worker, lida fora do loop da interface
+stats_cache = StatsCache(CONTATOS_FILE, SENT_DB)
 
 def get_stats():
-    """Obtém estatísticas dos envios"""
+    """Obtém estatísticas dos envios (cacheadas por mtime/tamanho dos arquivos)"""
     stats = {'total': 0, 'enviados': 0}
     try:
-        if os.path.exists(CONTATOS_FILE):
-            df = pd.read_excel(CONTATOS_FILE, dtype=str)
-            stats['total'] = len(df)
-        
-        if os.path.exists(SENT_LOG):
-            with open(SENT_LOG, 'r', encoding='utf-8') as f:
-                lines = f.readlines()
-                stats['enviados'] = len([l for l in lines if l.strip()])
+        stats.update(stats_cache.get())
     except:
         pass
     return stats
 
-def run_script(script, message=None, link=None, use_profile=False):
-    global proc
-    with lock:
-        if proc and proc.poll() is None:
+# Eventos de progresso do worker (campanha, contatos, erros, tempos de cada fase)
+progresso = ProgressoCampanha()
+metricas = Metricas()
+
+def on_evento(ev):
+    progresso.aplicar(ev)
+    metricas.aplicar(ev)
+
+event_reader = EventReader(on_evento, ativo=lambda: bool(proc and proc.poll() is None))
+
+@app.get('/metrics')
+def metrics_endpoint():
+    """Histogramas de tempo por fase e contadores de erros/timeouts (formato Prometheus)"""
+    return PlainTextResponse(metricas.prometheus(), media_type='text/plain; version=0.0.4')
+
+def worker_status():
+    """
+    Estado do worker: None se não há worker em execução.
+    Enquanto o worker inicia (canal ainda fechado) ou se não responder a tempo, é
+    considerado ocupado. Fala com o worker: chamar fora do loop da interface (run.io_bound).
+    """
+    if not (proc and proc.poll() is None):
+        return None
+    return worker.request('status') or {'ok': False, 'pronto': False, 'ocupado': True, 'fila': 0, 'sessao': 'iniciando'}
+
+def worker_busy(status):
+    return bool(status and (status.get('ocupado') or status.get('fila')))
+
+async def atualizar_status_worker():
+    """Consulta o worker fora do loop da interface; sample_status usa a última resposta"""
+    global ultimo_status
+    if proc and proc.poll() is None:
+        ultimo_status = await run.io_bound(worker_status)
+    else:
+        ultimo_status = None
+
+def sample_status():
+    """Amostra o estado compartilhado pelo painel (worker e estatísticas)"""
+    status = ultimo_status if proc and proc.poll() is None else None
+    state = {'running': worker_busy(status), 'sessao': status.get('sessao') if status else None,
+             'pausado': bool(status and status.get('pausado'))}
+    state.update(get_stats())
+    # Progresso da campanha atual, montado a partir dos eventos do worker (sem I/O)
+    state.update(progresso.snapshot())
+    state['latencias'] = metricas.resumo()
+    return state
+
+# O painel é o único escritor do log: a saída do worker chega por pipe
+system_log = SystemLog(LOG, max_bytes=int(LOG_MAX_MB * 1024 * 1024), backups=LOG_BACKUPS)
+poller = StatusPoller(sample_status, LogTailer(LOG, initial_lines=150), max_lines=150)
+app.timer(0.5, atualizar_status_worker)
+app.timer(0.5, poller.poll)
+
+# Índice de busca do log: alimentado só com as linhas novas, com ou sem abas abertas
+indice_log = IndiceLog(BUSCA_DB, LOG, backups=LOG_BACKUPS, dias=BUSCA_DIAS)
+
+async def atualizar_indice():
+    try:
+        await run.io_bound(indice_log.atualizar)
+    except Exception as e:
+        print(f"[AVISO] Erro ao atualizar o índice de busca: {e}")
+
+app.timer(5.0, atualizar_indice)
+
+# Agregados da página /analytics (somados a partir dos registros novos do envios.db)
+analise = Analise(ANALISE_DB, SENT_DB)
+
+def matar_worker(alvo):
+    """Último recurso: mata o worker junto com o chromedriver e o Chrome que ele abriu."""
+    try:
+        if sys.platform == 'win32':
+            subprocess.run(['taskkill', '/F', '/T', '/PID', str(alvo.pid)],
+                           stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        else:
+            os.killpg(alvo.pid, signal.SIGKILL)  # o worker é líder do próprio grupo
+    except OSError:
+        pass
+    try:
+        alvo.kill()
+        alvo.wait(timeout=10)
+    except (OSError, subprocess.TimeoutExpired):
+        pass
+
+def encerrar_worker(timeout=10):
+    """
+    Pede ao worker para parar após o contato atual e encerrar (fecha o Chrome e remove o
+    perfil temporário). Se não sair em `timeout` segundos recebe SIGTERM (CTRL_BREAK_EVENT no
+    Windows), que no worker ainda passa pela mesma limpeza; se nem assim sair, o worker e o
+    Chrome são mortos e o painel remove o perfil temporário.
+    """
+    global proc, proc_temp_profile
+    alvo, perfil = proc, proc_temp_profile
+    if alvo and alvo.poll() is None:
+        worker.request('encerrar')
+        try:
+            alvo.wait(timeout=timeout)
+        except subprocess.TimeoutExpired:
+            # No Windows terminate() é TerminateProcess (sem limpeza nenhuma)
+            if sys.platform == 'win32':
+                alvo.send_signal(signal.CTRL_BREAK_EVENT)
+            else:
+                alvo.terminate()
+            try:
+                alvo.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                matar_worker(alvo)
+    worker.close_connection()
+    # Normalmente o worker já removeu o perfil; sobra dele se foi morto
+    if perfil and (alvo is None or alvo.poll() is not None) and os.path.exists(perfil):
+        shutil.rmtree(perfil, ignore_errors=True)
+    if proc is alvo:
+        proc = None
+        proc_temp_profile = None
+
+app.on_shutdown(encerrar_worker)
+app.on_shutdown(system_log.close)
+app.on_shutdown(indice_log.close)
+app.on_shutdown(analise.close)
+
+# Nomes das fases no quadro de latência
+FASE_TEXTOS = {
+    'pagina': 'Abrir conversa',
+    'footer': 'Aguardar rodapé',
+    'campo': 'Localizar campo',
+    'preenchimento': 'Conferir texto',
+    'envio': 'Confirmar envio',
+    'espera': 'Intervalo',
+    'total': 'Total por contato',
+}
+
+# Textos do estado da sessão do WhatsApp Web informado pelo worker
+SESSAO_TEXTOS = {
+    None: '📱 WhatsApp Web: fechado',
+    'iniciando': '🚀 Abrindo o Chrome...',
+    'carregando': '⏳ Carregando o WhatsApp Web...',
+    'qr': '📷 Escaneie o QR Code no Chrome',
+    'pronto': '✅ WhatsApp Web conectado',
+}
+
+async def run_script(script, message=None, link=None, use_profile=False, resume=False, asset_cache=False, lean=False):
+    # Conversas com o worker e a parada dele acontecem fora do loop da interface
+    async with envio_lock:
+        status = await run.io_bound(worker_status)
+        if worker_busy(status):
             ui.notify('⚠️ Já há um script em execução!', type='warning', position='top')
             return
         
@@ -49,49 +218,190 @@ def run_script(script, message=None, link=None, use_profile=False):
             ui.notify(f'❌ Arquivo {CONTATOS_FILE} não encontrado!', type='negative', position='top')
             return
         
+        # Validar as variáveis do template contra as colunas da planilha (só o cabeçalho é lido)
+        try:
+            _, erro = validar_template(CONTATOS_FILE, message)
+        except Exception:
+            erro = None  # Erro de leitura: o worker informa no log
+        if erro:
+            ui.notify(f'❌ {erro}', type='negative', position='top')
+            return
+        
         # Usar caminho absoluto do script para portabilidade
         script_path = os.path.join(SCRIPT_DIR, script)
         if not os.path.exists(script_path):
             ui.notify(f'❌ Script {script} não encontrado!', type='negative', position='top')
             return
         
-        env = os.environ.copy()
-        if message is not None:
-            env['MSG_TEMPLATE'] = message
-        if link is not None:
-            env['MSG_LINK'] = link
-        env['USE_PROFILE'] = 'true' if use_profile else 'false'
+        # Worker ocioso com o WhatsApp já carregado: apenas enfileirar a campanha
+        if status is not None and proc_profile == (use_profile, asset_cache, lean):
+            reply = await run.io_bound(worker.request, 'campanha', template=message, link=link or '', resume=resume)
+            if reply and reply.get('ok'):
+                ui.notify('🚀 Envio iniciado com sucesso!', type='positive', position='top', timeout=3000)
+                return
         
-        # Configurar encoding UTF-8 para o subprocess no Windows
-        if sys.platform == 'win32':
-            env['PYTHONIOENCODING'] = 'utf-8'
-        
-        stdout_file = open(LOG, 'a', encoding='utf-8', errors='replace')
-        stderr_file = open(LOG, 'a', encoding='utf-8', errors='replace')
-        
-        # Usar caminho absoluto do Python e do script para portabilidade
-        python_exe = sys.executable
-        # Não usar CREATE_NO_WINDOW - o Chrome precisa estar visível para login
-        proc = subprocess.Popen([python_exe, script_path],
-                                stdout=stdout_file,
-                                stderr=stderr_file,
-                                env=env,
-                                cwd=SCRIPT_DIR)
-        ui.notify('🚀 Envio iniciado com sucesso!', type='positive', position='top', timeout=3000)
-
-def stop_script():
-    global proc
-    with lock:
-        if proc and proc.poll() is None:
-            proc.terminate()
-            ui.notify('⏹️ Script interrompido', type='info', position='top')
+        # Modo de perfil diferente (ou worker inacessível): reiniciar o worker (a parada pode
+        # levar alguns segundos)
+        if status is not None or (proc is not None and proc.poll() is None):
+            await run.io_bound(encerrar_worker)
+        with lock:
+            if proc is not None and proc.poll() is None:
+                ui.notify('⚠️ Já há um script em execução!', type='warning', position='top')
+                return
+            iniciar_worker(script_path, message, link, use_profile, resume, asset_cache, lean)
+            ui.notify('🚀 Envio iniciado com sucesso!', type='positive', position='top', timeout=3000)
+
+def iniciar_worker(script_path, message, link, use_profile, resume, asset_cache, lean):
+    """Inicia o worker de envio com a primeira campanha (chamado com `lock`)."""
+    global proc, proc_profile, proc_temp_profile
+    env = os.environ.copy()
+    if message is not None:
+        env['MSG_TEMPLATE'] = message
+    if link is not None:
+        env['MSG_LINK'] = link
+    env['USE_PROFILE'] = 'true' if use_profile else 'false'
+    env['ASSET_CACHE'] = 'true' if asset_cache else 'false'
+    env['LEAN_BROWSER'] = 'true' if lean else 'false'
+    env['RESUME'] = 'true' if resume else 'false'
+    # Modo portável: o painel escolhe a pasta do perfil temporário, para removê-la mesmo
+    # se o worker precisar ser morto
+    perfil_temp = None if use_profile else tempfile.mkdtemp(prefix='whatsapp_temp_')
+    if perfil_temp:
+        env['TEMP_PROFILE'] = perfil_temp
+    
+    # Saída do worker em UTF-8 e sem buffer: cada linha chega ao log assim que é impressa
+    env['PYTHONIOENCODING'] = 'utf-8'
+    env['PYTHONUNBUFFERED'] = '1'
+    # O worker lê o stdin até EOF: se o painel morrer sem encerrá-lo, o pipe fecha e ele sai
+    # (liberando a porta do canal e o Chrome)
+    env['WORKER_VIGIAR_PAINEL'] = 'true'
+    
+    # Usar caminho absoluto do Python e do script para portabilidade
+    python_exe = sys.executable
+    # Worker residente: mantém o Chrome aberto entre campanhas.
+    # A primeira campanha vai pelo env; as próximas pelo canal local.
+    # Não usar CREATE_NO_WINDOW - o Chrome precisa estar visível para login.
+    # Em um grupo de processos próprio o worker pode receber CTRL_BREAK_EVENT (Windows) e ser
+    # morto junto com o Chrome (os.killpg) sem atingir o painel.
+    if sys.platform == 'win32':
+        grupo = {'creationflags': subprocess.CREATE_NEW_PROCESS_GROUP}
+    else:
+        grupo = {'start_new_session': True}
+    proc = subprocess.Popen([python_exe, script_path, '--worker'],
+                            stdin=subprocess.PIPE,
+                            stdout=subprocess.PIPE,
+                            stderr=subprocess.STDOUT,
+                            env=env,
+                            cwd=SCRIPT_DIR,
+                            **grupo)
+    system_log.acompanhar(proc.stdout)
+    proc_profile = (use_profile, asset_cache, lean)
+    proc_temp_profile = perfil_temp
+    event_reader.iniciar()
+
+def preflight_campanha(message, link, resume):
+    """Pré-verificação da campanha (sem Chrome); executada fora do loop da interface"""
+    store = SentStore(SENT_DB)
+    try:
+        return verificar_campanha(CONTATOS_FILE, message, (link or '').strip(), store,
+                                  resume=resume, intervalo_min=MIN_INTERVAL)
+    finally:
+        store.close()
+
+async def preverificar(message, link, resume):
+    if not message or not message.strip():
+        ui.notify('❌ Digite uma mensagem antes de verificar!', type='negative', position='top')
+        return
+    if not os.path.exists(CONTATOS_FILE):
+        ui.notify(f'❌ Arquivo {CONTATOS_FILE} não encontrado!', type='negative', position='top')
+        return
+    
+    notificacao = ui.notification('🔍 Verificando a planilha...', spinner=True, timeout=None, position='top')
+    try:
+        rel = await run.io_bound(preflight_campanha, message, link, resume)
+    finally:
+        notificacao.dismiss()
+    
+    with ui.dialog() as dialog, ui.card().classes('w-full').style('max-width: 900px'):
+        ui.label('🔍 Pré-verificação (nenhuma mensagem enviada)').classes('card-title')
+        if rel['erro']:
+            ui.label(f'❌ {rel["erro"]}').classes('text-negative')
         else:
-            ui.notify('ℹ️ Nenhum script em execução', type='info', position='top')
+            ui.label(f'📄 Linhas na planilha: {rel["total"]}')
+            ui.label(f'✅ A enviar: {rel["validos"]}')
+            ui.label(f'❌ Rejeitados: {rel["rejeitados"]} (duplicados: {rel["duplicados"]})')
+            if rel['pulados']:
+                ui.label(f'🔁 Pulados (já enviados): {rel["pulados"]}')
+            base = 'média dos últimos envios' if rel['historico'] else 'intervalo mínimo, sem histórico'
+            ui.label(f'⏱️ Duração estimada: {formatar_duracao(rel["eta_segundos"])} '
+                     f'({rel["segundos_por_contato"]:.1f} s por contato, {base})')
+            for motivo, n in rel['motivos'].items():
+                ui.label(f'{n} × {motivo}').classes('text-sm text-grey-700')
+            if rel['amostra']:
+                colunas = [{'name': c, 'label': c.capitalize(), 'field': c, 'align': 'left'}
+                           for c in ('linha', 'nome', 'numero', 'motivo')]
+                linhas = [{'linha': linha, 'nome': nome or '-', 'numero': numero or '-', 'motivo': motivo}
+                          for linha, nome, numero, motivo in rel['amostra']]
+                ui.table(columns=colunas, rows=linhas, row_key='linha', pagination=10).classes('w-full')
+                if rel['rejeitados'] > len(rel['amostra']):
+                    ui.label(f'... e mais {rel["rejeitados"] - len(rel["amostra"])} linhas rejeitadas (lista completa com python sender.py --dry-run)').classes('text-xs text-grey-600')
+        ui.button('Fechar', on_click=dialog.close).props('flat')
+    dialog.open()
 
-@ui.page('/')
-def main_page():
-    # CSS moderno e responsivo
-    ui.add_head_html('''
+# Colunas da busca no histórico, por fonte
+COLUNAS_BUSCA = {
+    'envios': [('ts', 'Data/hora'), ('linha', 'Linha'), ('nome', 'Nome'), ('numero', 'Número'),
+               ('status', 'Status'), ('erro', 'Erro'), ('tempo', 'Tempo')],
+    'log': [('ts', 'Data/hora'), ('nivel', 'Nível'), ('numero', 'Número'), ('nome', 'Nome'),
+            ('texto', 'Linha do log')],
+}
+
+def buscar_historico(fonte, filtros, pagina):
+    """Busca nos envios (envios.db) ou no índice do log; executada fora do loop da interface"""
+    if fonte == 'log':
+        total, linhas = indice_log.buscar(pagina=pagina, **filtros)
+        return total, [dict(zip(('ts', 'nivel', 'numero', 'nome', 'texto'), linha)) for linha in linhas]
+    conn = conectar(SENT_DB, readonly=True)
+    if conn is None:
+        return 0, []
+    try:
+        total, linhas = buscar_envios(conn, pagina=pagina, **filtros)
+    finally:
+        conn.close()
+    return total, [{'ts': ts, 'linha': linha + 1 if linha is not None else '-', 'nome': nome or '-',
+                    'numero': numero, 'status': status, 'erro': erro or '',
+                    'tempo': f'{t_total:.1f} s' if t_total is not None else '-'}
+                   for ts, linha, nome, numero, status, erro, t_total in linhas]
+
+async def pause_script():
+    """Pausa ou retoma o envio entre um contato e outro (o Chrome continua aberto)"""
+    status = await run.io_bound(worker_status)
+    if not worker_busy(status):
+        ui.notify('ℹ️ Nenhum envio em andamento', type='info', position='top')
+        return
+    pausar = not status.get('pausado')
+    reply = await run.io_bound(worker.request, 'pausar' if pausar else 'retomar')
+    if not (reply and reply.get('ok')):
+        ui.notify('⚠️ Não foi possível falar com o worker de envio', type='warning', position='top')
+    elif pausar:
+        ui.notify('⏸️ O envio será pausado após o contato atual', type='info', position='top')
+    else:
+        ui.notify('▶️ Envio retomado', type='positive', position='top')
+
+async def stop_script():
+    """Parada suave: o contato atual termina, o progresso fica gravado e o Chrome é fechado"""
+    if not (proc and proc.poll() is None):
+        ui.notify('ℹ️ Nenhum script em execução', type='info', position='top')
+        return
+    notificacao = ui.notification('⏹️ Parando após o contato atual...', spinner=True, timeout=None, position='top')
+    try:
+        await run.io_bound(encerrar_worker, STOP_TIMEOUT)
+    finally:
+        notificacao.dismiss()
+    ui.notify('⏹️ Envio parado e Chrome fechado', type='info', position='top')
+
+# CSS moderno e responsivo (painel e /analytics)
+ESTILO = '''
     <style>
         * {
             box-sizing: border-box;
@@ -272,7 +582,11 @@ def main_page():
             transition: width 0.3s ease;
         }
     </style>
-    ''')
+    '''
+
+@ui.page('/')
+def main_page():
+    ui.add_head_html(ESTILO)
     
     with ui.column().classes('main-wrapper'):
         # Header Principal
@@ -280,6 +594,7 @@ def main_page():
             ui.icon('whatsapp', size='64px').classes('mb-4')
             ui.label('Bot WhatsApp').classes('text-h2 font-bold mb-2')
             ui.label('Sistema de Envio em Massa').classes('text-h6 opacity-90')
+            ui.link('📈 Análise das campanhas', '/analytics').classes('text-white mt-2')
         
         # Estatísticas - Grid Responsivo
         stats = {'total': 0, 'enviados': 0, 'erros': 0}
@@ -311,6 +626,13 @@ def main_page():
                 ui.label('📊').classes('stat-icon')
                 taxa_label = ui.label(f'{taxa:.1f}%').classes('stat-number')
                 ui.label('Taxa de Sucesso').classes('stat-label')
+            
+            # Erros da campanha atual (falhas no envio + linhas rejeitadas)
+            with ui.card().classes('stat-box erros'):
+                ui.label('❌').classes('stat-icon')
+                erros_label = ui.label(str(stats['erros'])).classes('stat-number')
+                ui.label('Erros na Campanha').classes('stat-label')
+                ultimo_erro_label = ui.label('').classes('text-xs text-grey-600')
         
         # Grid Principal - Configuração e Controles lado a lado
         with ui.row().classes('content-grid w-full'):
@@ -321,7 +643,7 @@ def main_page():
                     
                     message_input = ui.textarea(
                         label='Mensagem',
-                        placeholder='Digite sua mensagem aqui...\n\nUse {nome} para personalizar para cada contato.\nExemplo: Olá {nome}, tudo bem?',
+                        placeholder='Digite sua mensagem aqui...\n\nUse {nome} ou qualquer coluna da planilha (ex.: {cidade}) para personalizar.\nExemplo: Olá {nome}, tudo bem?',
                         value='Olá {nome}, tudo bem?'
                     ).classes('input-field w-full').props('rows=6 outlined autogrow')
                     
@@ -334,7 +656,7 @@ def main_page():
                     with ui.column().classes('w-full mt-4'):
                         with ui.row().classes('quick-info'):
                             ui.icon('info', size='20px').classes('text-blue-600')
-                            ui.label('Use {nome} no template para personalizar cada mensagem').classes('text-sm')
+                            ui.label('Use {nome} ou outras colunas da planilha, como {cidade}, para personalizar cada mensagem').classes('text-sm')
                         
                         with ui.row().classes('quick-info'):
                             ui.icon('link', size='20px').classes('text-blue-600')
@@ -347,6 +669,7 @@ def main_page():
                     
                     # Status atual
                     status_badge = ui.label('⏸️ Aguardando').classes('status-badge status-waiting mb-4')
+                    session_label = ui.label(SESSAO_TEXTOS[None]).classes('text-sm text-grey-700 mb-2')
                     
                     # Barra de progresso
                     progress_container = ui.column().classes('w-full mb-4')
@@ -358,29 +681,68 @@ def main_page():
                     with ui.row().classes('w-full gap-3 justify-center'):
                         start_btn = ui.button(
                             '🚀 Iniciar Envio',
-                            on_click=lambda: run_script('sender.py', message_input.value, link_input.value, use_profile_switch.value)
+                            on_click=lambda: run_script('sender.py', message_input.value, link_input.value, use_profile_switch.value, resume_switch.value, asset_cache_switch.value, lean_switch.value)
                         ).classes('btn-large').props('color=primary size=lg')
                         
+                        # Pausa entre um contato e outro, sem fechar o Chrome
+                        pause_btn = ui.button(
+                            '⏸️ Pausar',
+                            on_click=pause_script
+                        ).classes('btn-large').props('color=warning size=lg disabled')
+                        
                         stop_btn = ui.button(
                             '⏹️ Parar',
                             on_click=stop_script
                         ).classes('btn-large').props('color=negative size=lg')
                     
+                    # Pré-verificação: planilha, duplicados, template e duração estimada (sem Chrome)
+                    ui.button(
+                        '🔍 Pré-verificar',
+                        on_click=lambda: preverificar(message_input.value, link_input.value, resume_switch.value)
+                    ).classes('w-full mt-3').props('outline color=primary')
+                    
                     # Opção de perfil persistente
                     use_profile_switch = ui.switch('💾 Usar perfil persistente (salva login)', value=False).classes('w-full mt-4')
                     ui.label('Desligado = Login toda vez (portável) | Ligado = Salva login').classes('text-xs text-grey-600 mb-2')
                     
+                    # Cache de arquivos no modo portável (não guarda login)
+                    with ui.column().classes('w-full gap-0') as asset_cache_box:
+                        asset_cache_switch = ui.switch('⚡ Manter cache de arquivos do WhatsApp Web (sem sessão)',
+                                                       value=os.getenv('ASSET_CACHE', 'false').lower() == 'true').classes('w-full')
+                        ui.label('Abre mais rápido no modo portável; o login continua sendo pedido').classes('text-xs text-grey-600 mb-2')
+                    asset_cache_box.bind_visibility_from(use_profile_switch, 'value', backward=lambda v: not v)
+                    
+                    # Modo leve do Chrome
+                    lean_switch = ui.switch('🪶 Modo leve (sem imagens, mídia e fontes)',
+                                            value=os.getenv('LEAN_BROWSER', 'false').lower() == 'true').classes('w-full')
+                    ui.label('Menos CPU e memória; fotos e anexos não aparecem no Chrome').classes('text-xs text-grey-600 mb-2')
+                    
+                    # Retomar campanha
+                    # Desligado por padrão, como RESUME na linha de comando (lembretes recorrentes
+                    # repetem a mesma mensagem de propósito)
+                    resume_switch = ui.switch('🔁 Retomar campanha (pula já enviados)',
+                                              value=os.getenv('RESUME', 'false').lower() == 'true').classes('w-full')
+                    ui.label('Pula contatos que já receberam esta mesma mensagem').classes('text-xs text-grey-600 mb-2')
+                    
                     # Informações do arquivo
                     with ui.column().classes('w-full mt-4'):
                         ui.separator()
                         file_name = os.path.basename(CONTATOS_FILE)
                         file_info = ui.label(f'📄 Arquivo: {file_name}').classes('text-sm text-grey-600 mt-2')
                         if os.path.exists(CONTATOS_FILE):
-                            try:
-                                df = pd.read_excel(CONTATOS_FILE, dtype=str)
-                                file_info.text = f'📄 Arquivo: {file_name} ({len(df)} contatos)'
-                            except:
-                                pass
+                            file_info.text = f'📄 Arquivo: {file_name} ({stats["total"]} contatos)'
+        
+        # Latência por fase (média e p90 desde que o painel foi aberto)
+        with ui.card().classes('w-full'):
+            ui.label('⏱️ Tempo por Fase').classes('card-title')
+            latencia_labels = {}
+            with ui.grid(columns=4).classes('w-full gap-x-6 gap-y-1 text-sm'):
+                for texto in ('Fase', 'Média', 'p90', 'Contatos'):
+                    ui.label(texto).classes('font-bold text-grey-700')
+                for fase, texto in FASE_TEXTOS.items():
+                    ui.label(texto)
+                    latencia_labels[fase] = (ui.label('-'), ui.label('-'), ui.label('0'))
+            ui.label('Métricas completas em /metrics (formato Prometheus)').classes('text-xs text-grey-600 mt-2')
         
         # Logs - Tela cheia
         with ui.card().classes('w-full'):
@@ -390,52 +752,129 @@ def main_page():
             
             log_widget = ui.log(max_lines=150).classes('log-viewer w-full')
             
-            def update_log():
-                try:
-                    # Atualizar status
-                    global proc
-                    is_running = False
-                    with lock:
-                        if proc and proc.poll() is None:
-                            is_running = True
-                    
-                    if is_running:
-                        status_badge.text = '🟢 Em Execução'
-                        status_badge.style('background: #E8F5E9; color: #2E7D32; padding: 8px 20px; border-radius: 20px; font-weight: 600;')
-                        status_label.text = '🟢 Em Execução'
-                        status_label.style('background: #E8F5E9; color: #2E7D32; padding: 8px 20px; border-radius: 20px; font-weight: 600;')
+            campanha = {'campanha_total': 0, 'campanha_enviados': 0, 'campanha_falhas': 0,
+                        'campanha_rejeitados': 0, 'campanha_pulados': 0}
+            execucao = {'running': False, 'pausado': False}
+            
+            def apply_changes(changes):
+                """Aplica no painel apenas os campos que mudaram (enviados pelo poller)"""
+                # Atualizar status (em execução, pausado ou aguardando)
+                if 'running' in changes or 'pausado' in changes:
+                    execucao.update({k: changes[k] for k in ('running', 'pausado') if k in changes})
+                    if execucao['running'] and execucao['pausado']:
+                        texto, estilo = '⏸️ Pausado', 'background: #FFF8E1; color: #F57F17;'
+                    elif execucao['running']:
+                        texto, estilo = '🟢 Em Execução', 'background: #E8F5E9; color: #2E7D32;'
+                    else:
+                        texto, estilo = '⏸️ Aguardando', 'background: #F5F5F5; color: #616161;'
+                    for badge in (status_badge, status_label):
+                        badge.text = texto
+                        badge.style(estilo + ' padding: 8px 20px; border-radius: 20px; font-weight: 600;')
+                    if execucao['running']:
                         start_btn.props('disabled')
+                        pause_btn.props(remove='disabled')
                     else:
-                        status_badge.text = '⏸️ Aguardando'
-                        status_badge.style('background: #F5F5F5; color: #616161; padding: 8px 20px; border-radius: 20px; font-weight: 600;')
-                        status_label.text = '⏸️ Aguardando'
-                        status_label.style('background: #F5F5F5; color: #616161; padding: 8px 20px; border-radius: 20px; font-weight: 600;')
                         start_btn.props(remove='disabled')
-                    
-                    # Atualizar logs
-                    with open(LOG, 'r', encoding='utf-8') as f:
-                        lines = f.read().splitlines()[-150:]
-                        log_widget.set(lines)
-                    
-                    # Atualizar estatísticas e progresso
-                    new_stats = get_stats()
-                    if new_stats['enviados'] != stats['enviados'] or new_stats['total'] != stats['total']:
-                        stats['enviados'] = new_stats['enviados']
-                        stats['total'] = new_stats['total']
-                        enviados_label.text = str(stats['enviados'])
-                        pendentes_label.text = str(max(0, stats['total'] - stats['enviados']))
-                        
-                        # Atualizar progresso
-                        if stats['total'] > 0:
-                            progress = (stats['enviados'] / stats['total']) * 100
-                            progress_bar.value = progress / 100
-                            progress_text.text = f'{progress:.1f}% ({stats["enviados"]}/{stats["total"]})'
-                            taxa_label.text = f'{progress:.1f}%'
-                except Exception as e:
-                    pass
+                        pause_btn.props('disabled')
+                    pause_btn.text = '▶️ Retomar' if execucao['pausado'] else '⏸️ Pausar'
+                
+                # Estado da sessão do WhatsApp Web (QR Code, carregando, pronto)
+                if 'sessao' in changes:
+                    session_label.text = SESSAO_TEXTOS.get(changes['sessao'], SESSAO_TEXTOS[None])
+                
+                # Atualizar logs (apenas as linhas novas)
+                if changes.get('log_reset'):
+                    log_widget.clear()
+                for line in changes.get('log', ()):
+                    log_widget.push(line)
+                
+                # Atualizar estatísticas e progresso
+                if 'enviados' in changes or 'total' in changes:
+                    stats['enviados'] = changes.get('enviados', stats['enviados'])
+                    stats['total'] = changes.get('total', stats['total'])
+                    total_label.text = str(stats['total'])
+                    enviados_label.text = str(stats['enviados'])
+                    pendentes_label.text = str(max(0, stats['total'] - stats['enviados']))
+                    if stats['total'] > 0:
+                        taxa_label.text = f'{stats["enviados"] / stats["total"] * 100:.1f}%'
+                
+                # Progresso e erros da campanha atual (eventos do worker)
+                for key in campanha:
+                    if key in changes:
+                        campanha[key] = changes[key]
+                if any(key in changes for key in campanha):
+                    # Linhas da planilha já resolvidas: enviadas, com falha, rejeitadas ou puladas
+                    processados = (campanha['campanha_enviados'] + campanha['campanha_falhas']
+                                   + campanha['campanha_rejeitados'] + campanha['campanha_pulados'])
+                    if campanha['campanha_total'] > 0:
+                        progress = min(100, processados / campanha['campanha_total'] * 100)
+                        progress_bar.value = progress / 100
+                        progress_text.text = f'{progress:.1f}% ({processados}/{campanha["campanha_total"]})'
+                    stats['erros'] = campanha['campanha_falhas'] + campanha['campanha_rejeitados']
+                    erros_label.text = str(stats['erros'])
+                if 'ultimo_erro' in changes:
+                    ultimo_erro_label.text = changes['ultimo_erro']
+                
+                # Quadro de latência por fase
+                for fase, (n, media, p90) in changes.get('latencias', {}).items():
+                    if fase in latencia_labels and n:
+                        media_label, p90_label, n_label = latencia_labels[fase]
+                        media_label.text = f'{media:.2f} s'
+                        p90_label.text = f'≤ {p90:g} s' if p90 != float('inf') else '> 60 s'
+                        n_label.text = str(n)
             
-            ui.timer(0.5, update_log)
-        
+            # Um único produtor alimenta todas as abas abertas
+            client = ui.context.client
+            client.on_connect(lambda: poller.subscribe(apply_changes))
+            client.on_disconnect(lambda: poller.unsubscribe(apply_changes))
+
+        # Busca no histórico de envios e no log (consultas indexadas, em páginas)
+        with ui.card().classes('w-full'):
+            ui.label('🔎 Buscar no Histórico').classes('card-title')
+            with ui.row().classes('w-full items-center gap-3'):
+                fonte_busca = ui.toggle({'envios': 'Envios', 'log': 'Log do sistema'}, value='envios')
+                numero_busca = ui.input('Número').props('outlined dense clearable')
+                nome_busca = ui.input('Nome').props('outlined dense clearable')
+                status_busca = ui.select({'todos': 'Todos', 'ok': 'Enviados', 'erro': 'Erros'},
+                                         value='todos', label='Status').props('outlined dense').classes('w-32')
+                inicio_busca = ui.input('De', placeholder='AAAA-MM-DD').props('outlined dense clearable').classes('w-40')
+                fim_busca = ui.input('Até', placeholder='AAAA-MM-DD').props('outlined dense clearable').classes('w-40')
+                ui.button('Buscar', icon='search', on_click=lambda: pesquisar(0)).props('color=primary')
+
+            busca_table = ui.table(columns=[], rows=[], row_key='id',
+                                   pagination={'rowsPerPage': 0}).classes('w-full').props('hide-pagination dense')
+            with ui.row().classes('w-full items-center justify-between'):
+                anterior_btn = ui.button('◀ Anterior', on_click=lambda: pesquisar(busca['pagina'] - 1)).props('flat disabled')
+                pagina_label = ui.label('').classes('text-sm text-grey-600')
+                proxima_btn = ui.button('Próxima ▶', on_click=lambda: pesquisar(busca['pagina'] + 1)).props('flat disabled')
+
+            busca = {'pagina': 0}
+
+            async def pesquisar(pagina):
+                fonte = fonte_busca.value
+                filtros = {'numero': numero_busca.value, 'nome': nome_busca.value,
+                           'status': status_busca.value, 'inicio': inicio_busca.value, 'fim': fim_busca.value}
+                try:
+                    total, linhas = await run.io_bound(buscar_historico, fonte, filtros, max(0, pagina))
+                except ValueError as e:
+                    ui.notify(f'❌ {e}', type='negative', position='top')
+                    return
+                busca['pagina'] = max(0, pagina)
+                for i, linha in enumerate(linhas):
+                    linha['id'] = i
+                busca_table.columns = [{'name': campo, 'label': texto, 'field': campo, 'align': 'left'}
+                                       for campo, texto in COLUNAS_BUSCA[fonte]]
+                busca_table.rows = linhas
+                busca_table.update()
+                paginas = max(1, -(-total // POR_PAGINA))
+                pagina_label.text = f'{total} resultados · página {busca["pagina"] + 1} de {paginas}'
+                for botao, habilitado in ((anterior_btn, busca['pagina'] > 0),
+                                          (proxima_btn, busca['pagina'] + 1 < paginas)):
+                    if habilitado:
+                        botao.props(remove='disabled')
+                    else:
+                        botao.props('disabled')
+
         # Ajuda Rápida - Colapsável
         with ui.card().classes('w-full'):
             with ui.expansion('❓ Ajuda Rápida', icon='help').classes('w-full'):
@@ -444,23 +883,170 @@ def main_page():
                     ### 📋 Passo a Passo:
                     
                     1. **Prepare o Excel**: Crie `data/contatos.xlsx` com colunas `nome` e `telefone`
-                    2. **Configure**: Digite sua mensagem (use `{nome}` para personalizar)
+                    2. **Configure**: Digite sua mensagem (use `{nome}` ou qualquer coluna da planilha para personalizar)
                     3. **Envie**: Clique em "Iniciar Envio" e acompanhe o progresso
                     
                     ### 💡 Dicas:
                     - O primeiro uso requer login manual no WhatsApp Web
                     - Use com moderação para evitar bloqueios
                     - Os logs mostram o progresso em tempo real
-                    - Você pode parar o envio a qualquer momento
+                    - Você pode pausar e retomar o envio sem fechar o Chrome
+                    - "Parar" termina o contato atual, fecha o Chrome e remove o perfil temporário; use "Retomar campanha" para continuar depois
                     
                     ### 📁 Arquivos:
                     - `data/contatos.xlsx` - Lista de contatos
-                    - `data/sent_log.csv` - Histórico de envios
+                    - `data/envios.db` - Histórico de envios (SQLite)
                     - `data/system.log` - Logs do sistema
+                    - `data/busca.db` - Índice do log para a busca no histórico
                     ''')
         
         # Footer
         with ui.row().classes('w-full justify-center mt-6 mb-4'):
             ui.label('Desenvolvido com ❤️ | Python + Selenium + NiceGUI').classes('text-caption text-white opacity-80')
 
-ui.run(title='Bot WhatsApp - Envio em Massa', host='0.0.0.0', port=8080, favicon='📱', dark=False)
+# Nomes das classes de erro na página /analytics (as demais aparecem pelo nome da exceção)
+CLASSE_TEXTOS = {
+    'timeout_chat': 'Conversa não abriu (timeout)',
+    'numero_invalido': 'Número não está no WhatsApp',
+    'campo_nao_encontrado': 'Campo de mensagem não encontrado',
+    'falha_envio': 'Falha ao enviar',
+    'nao_confirmado': 'Envio não confirmado',
+    'rejeitado': 'Linha rejeitada na planilha',
+    'outro': 'Outros erros',
+}
+
+def grafico_barras(series, cores):
+    """Opções de um gráfico de barras empilhadas (ECharts) com uma série por nome"""
+    return {
+        'tooltip': {'trigger': 'axis'},
+        'legend': {'data': series},
+        'grid': {'left': 50, 'right': 20, 'top': 40, 'bottom': 30},
+        'xAxis': {'type': 'category', 'data': []},
+        'yAxis': {'type': 'value', 'minInterval': 1},
+        'series': [{'name': nome, 'type': 'bar', 'stack': 'total', 'data': [], 'itemStyle': {'color': cor}}
+                   for nome, cor in zip(series, cores)],
+    }
+
+@ui.page('/analytics')
+def analytics_page():
+    ui.add_head_html(ESTILO)
+    
+    with ui.column().classes('main-wrapper'):
+        with ui.column().classes('header-section'):
+            ui.label('📈 Análise das Campanhas').classes('text-h3 font-bold mb-2')
+            ui.link('← Voltar ao painel', '/').classes('text-white')
+        
+        # Totais de todo o histórico
+        with ui.row().classes('stats-grid w-full'):
+            totais_labels = {}
+            for chave, icone, texto, classe in (('registros', '🗂️', 'Registros', 'total'),
+                                                 ('ok', '✅', 'Enviados', 'enviados'),
+                                                 ('falhas', '❌', 'Falhas no Envio', 'erros'),
+                                                 ('rejeitados', '🚫', 'Rejeitados', 'pendentes'),
+                                                 ('taxa', '📊', 'Taxa de Sucesso', 'enviados')):
+                with ui.card().classes(f'stat-box {classe}'):
+                    ui.label(icone).classes('stat-icon')
+                    totais_labels[chave] = ui.label('0').classes('stat-number')
+                    ui.label(texto).classes('stat-label')
+        
+        with ui.card().classes('w-full'):
+            ui.label('🕐 Envios por Hora (últimas 48 h)').classes('card-title')
+            horas_chart = ui.echart(grafico_barras(['Enviados', 'Falhas'], ['#4CAF50', '#F44336'])).classes('w-full h-64')
+        
+        with ui.card().classes('w-full'):
+            ui.label('📅 Envios por Dia (últimos 30 dias)').classes('card-title')
+            dias_chart = ui.echart(grafico_barras(['Enviados', 'Falhas', 'Rejeitados'],
+                                                  ['#4CAF50', '#F44336', '#FF9800'])).classes('w-full h-64')
+        
+        with ui.card().classes('w-full'):
+            ui.label('⏱️ Tempo Médio por Envio (últimos 30 dias)').classes('card-title')
+            fases_latencia = ('total', 'pagina', 'footer', 'envio')
+            latencia_chart = ui.echart({
+                'tooltip': {'trigger': 'axis', ':valueFormatter': 'v => v == null ? "-" : v.toFixed(2) + " s"'},
+                'legend': {'data': [FASE_TEXTOS[fase] for fase in fases_latencia]},
+                'grid': {'left': 50, 'right': 20, 'top': 40, 'bottom': 30},
+                'xAxis': {'type': 'category', 'data': []},
+                'yAxis': {'type': 'value', 'name': 's'},
+                'series': [{'name': FASE_TEXTOS[fase], 'type': 'line', 'connectNulls': True, 'data': []}
+                           for fase in fases_latencia],
+            }).classes('w-full h-64')
+        
+        with ui.row().classes('content-grid w-full'):
+            with ui.card().classes('w-full'):
+                ui.label('❌ Erros por Classe').classes('card-title')
+                erros_table = ui.table(columns=[
+                    {'name': 'classe', 'label': 'Classe', 'field': 'classe', 'align': 'left'},
+                    {'name': 'n', 'label': 'Registros', 'field': 'n'},
+                    {'name': 'taxa', 'label': '% do total', 'field': 'taxa'},
+                ], rows=[], row_key='classe').classes('w-full').props('dense')
+            
+            with ui.card().classes('w-full'):
+                ui.label('📝 Por Template').classes('card-title')
+                templates_table = ui.table(columns=[
+                    {'name': 'template', 'label': 'Template', 'field': 'template', 'align': 'left',
+                     'style': 'max-width: 260px; white-space: normal'},
+                    {'name': 'campanhas', 'label': 'Campanhas', 'field': 'campanhas'},
+                    {'name': 'ok', 'label': 'Enviados', 'field': 'ok'},
+                    {'name': 'falhas', 'label': 'Falhas', 'field': 'falhas'},
+                    {'name': 'rejeitados', 'label': 'Rejeitados', 'field': 'rejeitados'},
+                    {'name': 'taxa', 'label': 'Sucesso', 'field': 'taxa'},
+                    {'name': 'ultimo', 'label': 'Último envio', 'field': 'ultimo'},
+                ], rows=[], row_key='id').classes('w-full').props('dense')
+        
+        ui.label('Atualizado a cada 10 segundos a partir dos registros novos de data/envios.db').classes('text-caption text-white opacity-80')
+    
+    def mostrar(dados):
+        totais = dados['totais']
+        registros = totais['ok'] + totais['falhas'] + totais['rejeitados']
+        totais_labels['registros'].text = str(registros)
+        for chave in ('ok', 'falhas', 'rejeitados'):
+            totais_labels[chave].text = str(totais[chave])
+        tentativas = totais['ok'] + totais['falhas']
+        totais_labels['taxa'].text = f'{totais["ok"] / tentativas * 100:.1f}%' if tentativas else '-'
+        
+        horas_chart.options['xAxis']['data'] = [hora[11:] + 'h' for hora, _, _ in dados['horas']]
+        for serie, valores in zip(horas_chart.options['series'], zip(*[linha[1:] for linha in dados['horas']])):
+            serie['data'] = list(valores)
+        horas_chart.update()
+        
+        dias_chart.options['xAxis']['data'] = [dia[8:] + '/' + dia[5:7] for dia, *_ in dados['dias']]
+        latencia_chart.options['xAxis']['data'] = dias_chart.options['xAxis']['data']
+        for i, serie in enumerate(dias_chart.options['series']):
+            serie['data'] = [linha[1 + i] for linha in dados['dias']]
+        for fase, serie in zip(fases_latencia, latencia_chart.options['series']):
+            serie['data'] = [round(medias[fase], 3) if medias[fase] is not None else None
+                             for *_, medias in dados['dias']]
+        dias_chart.update()
+        latencia_chart.update()
+        
+        erros_table.rows = [{'classe': CLASSE_TEXTOS.get(classe, classe), 'n': n,
+                             'taxa': f'{n / registros * 100:.1f}%' if registros else '-'}
+                            for classe, n in dados['erros']]
+        templates_table.rows = [{'id': i, 'template': template or '(sem template registrado)',
+                                 'campanhas': campanhas, 'ok': ok, 'falhas': falhas, 'rejeitados': rejeitados,
+                                 'taxa': f'{ok / (ok + falhas) * 100:.1f}%' if ok + falhas else '-',
+                                 'ultimo': ultimo or '-'}
+                                for i, (template, campanhas, ok, falhas, rejeitados, ultimo) in enumerate(dados['templates'])]
+    
+    async def recarregar():
+        try:
+            await run.io_bound(analise.atualizar)
+        except Exception as e:
+            print(f"[AVISO] Erro ao atualizar a análise: {e}")
+        mostrar(analise.painel())
+    
+    # A primeira execução é imediata; as seguintes somam só os registros novos
+    ui.timer(10.0, recarregar)
+
+def main():
+    os.makedirs(os.path.join(SCRIPT_DIR, 'data'), exist_ok=True)
+    open(LOG, 'a').close()
+    # Criar o banco de envios (importando o histórico antigo de sent_log.csv, se houver)
+    SentStore(SENT_DB, legacy_csv=SENT_LOG).close()
+    # Sem reload: o modo de desenvolvimento do uvicorn sobe um segundo processo que
+    # importa tudo de novo e fica observando os arquivos da pasta
+    ui.run(title='Bot WhatsApp - Envio em Massa', host='0.0.0.0', port=8080, favicon='📱', dark=False,
+           reload=False)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,136 @@
+import threading
+from bisect import bisect_left
+
+# Fases medidas em cada contato (segundos), na ordem em que acontecem:
+#   pagina         abrir a conversa (URL ou navegação dentro do app)
+#   footer         esperar o rodapé da conversa
+#   campo          localizar o campo de mensagem
+#   preenchimento  conferir o texto pré-preenchido
+#   envio          confirmar o envio (campo esvaziado)
+#   espera         intervalo até o próximo contato (SEND_MIN_INTERVAL)
+#   total          do início do contato até o resultado
+FASES = ('pagina', 'footer', 'campo', 'preenchimento', 'envio', 'espera', 'total')
+
+# Limites dos baldes dos histogramas (segundos)
+BALDES = (0.05, 0.1, 0.25, 0.5, 1, 2, 5, 10, 20, 30, 60)
+
+
+class Histograma:
+    """Histograma cumulativo no formato do Prometheus (baldes fixos, soma e contagem)."""
+
+    def __init__(self, baldes=BALDES):
+        self.baldes = baldes
+        self.contagens = [0] * (len(baldes) + 1)
+        self.soma = 0.0
+        self.n = 0
+
+    def observar(self, valor):
+        self.contagens[bisect_left(self.baldes, valor)] += 1
+        self.soma += valor
+        self.n += 1
+
+    def percentil(self, p):
+        """Estimativa do percentil pelo limite superior do balde (None sem observações)."""
+        if not self.n:
+            return None
+        alvo = self.n * p / 100
+        acumulado = 0
+        for limite, contagem in zip(self.baldes, self.contagens):
+            acumulado += contagem
+            if acumulado >= alvo:
+                return limite
+        return float('inf')
+
+
+def _rotulos(**rotulos):
+    return '{' + ','.join(f'{k}="{v}"' for k, v in rotulos.items()) + '}'
+
+
+class Metricas:
+    """
+    Métricas de envio agregadas a partir dos eventos do worker (ver eventos.py).
+    Cada evento custa apenas algumas somas; o texto do /metrics só é montado
+    quando alguém consulta.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.fases = {fase: Histograma() for fase in FASES}
+        self.contatos = {'ok': 0, 'erro': 0}
+        self.erros = {}
+        self.timeouts = {}
+        self.campanhas = 0
+        self.rejeitados = 0
+        self.pulados = 0
+        self._contagem = (0, 0)  # rejeitados/pulados já contados da campanha atual
+
+    def aplicar(self, ev):
+        tipo = ev.get('evento')
+        with self._lock:
+            if tipo == 'campanha_inicio':
+                self.campanhas += 1
+                self._contagem = (0, 0)
+            if tipo in ('campanha_inicio', 'campanha_contagem'):
+                # Contagens acumuladas da campanha: somar apenas a diferença
+                rejeitados, pulados = ev.get('rejeitados', 0), ev.get('pulados', 0)
+                self.rejeitados += rejeitados - self._contagem[0]
+                self.pulados += pulados - self._contagem[1]
+                self._contagem = (rejeitados, pulados)
+            elif tipo in ('contato_ok', 'contato_falha'):
+                self.contatos['ok' if tipo == 'contato_ok' else 'erro'] += 1
+                for fase, valor in (ev.get('tempos') or {}).items():
+                    if fase in self.fases and valor is not None:
+                        self.fases[fase].observar(valor)
+                for etapa in ev.get('timeouts') or ():
+                    self.timeouts[etapa] = self.timeouts.get(etapa, 0) + 1
+                if tipo == 'contato_falha':
+                    erro = ev.get('tipo') or 'outro'
+                    self.erros[erro] = self.erros.get(erro, 0) + 1
+            elif tipo == 'intervalo':
+                self.fases['espera'].observar(ev.get('segundos', 0))
+
+    def resumo(self):
+        """Média e p90 (estimado) de cada fase, para o painel: {fase: (n, media, p90)}."""
+        with self._lock:
+            return {fase: (h.n, h.soma / h.n if h.n else 0.0, h.percentil(90))
+                    for fase, h in self.fases.items()}
+
+    def prometheus(self):
+        """Texto no formato de exposição do Prometheus."""
+        linhas = []
+        with self._lock:
+            linhas.append('# HELP whatsapp_fase_segundos Duração de cada fase do envio por contato.')
+            linhas.append('# TYPE whatsapp_fase_segundos histogram')
+            for fase, h in self.fases.items():
+                acumulado = 0
+                for limite, contagem in zip(h.baldes, h.contagens):
+                    acumulado += contagem
+                    linhas.append(f'whatsapp_fase_segundos_bucket{_rotulos(fase=fase, le=limite)} {acumulado}')
+                linhas.append(f'whatsapp_fase_segundos_bucket{_rotulos(fase=fase, le="+Inf")} {h.n}')
+                linhas.append(f'whatsapp_fase_segundos_sum{_rotulos(fase=fase)} {h.soma:.6f}')
+                linhas.append(f'whatsapp_fase_segundos_count{_rotulos(fase=fase)} {h.n}')
+
+            linhas.append('# HELP whatsapp_contatos_total Contatos processados pelo worker por resultado.')
+            linhas.append('# TYPE whatsapp_contatos_total counter')
+            for status, n in self.contatos.items():
+                linhas.append(f'whatsapp_contatos_total{_rotulos(status=status)} {n}')
+
+            linhas.append('# HELP whatsapp_erros_total Falhas de envio por tipo.')
+            linhas.append('# TYPE whatsapp_erros_total counter')
+            for tipo, n in sorted(self.erros.items()):
+                linhas.append(f'whatsapp_erros_total{_rotulos(tipo=tipo)} {n}')
+
+            linhas.append('# HELP whatsapp_timeouts_total Esperas que atingiram o tempo limite, por etapa.')
+            linhas.append('# TYPE whatsapp_timeouts_total counter')
+            for etapa, n in sorted(self.timeouts.items()):
+                linhas.append(f'whatsapp_timeouts_total{_rotulos(etapa=etapa)} {n}')
+
+            for nome, valor, ajuda in (
+                ('whatsapp_campanhas_total', self.campanhas, 'Campanhas iniciadas.'),
+                ('whatsapp_rejeitados_total', self.rejeitados, 'Linhas da planilha rejeitadas na validação.'),
+                ('whatsapp_pulados_total', self.pulados, 'Contatos pulados por já terem recebido a mensagem.'),
+            ):
+                linhas.append(f'# HELP {nome} {ajuda}')
+                linhas.append(f'# TYPE {nome} counter')
+                linhas.append(f'{nome} {valor}')
+        return '\n'.join(linhas) + '\n'
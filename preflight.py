@@ -0,0 +1,92 @@
+from collections import Counter
+
+from contatos import contar_linhas, preparar_em_blocos, validar_template
+
+# Linhas rejeitadas listadas no relatório (as demais entram só na contagem por motivo)
+MAX_AMOSTRA = 200
+
+
+def formatar_duracao(segundos):
+    """Duração legível: '45 s', '12 min', '3 h 05 min'."""
+    segundos = int(round(segundos))
+    if segundos < 60:
+        return f'{segundos} s'
+    minutos = segundos // 60
+    if minutos < 60:
+        return f'{minutos} min'
+    return f'{minutos // 60} h {minutos % 60:02d} min'
+
+
+def verificar_campanha(path, template, link='', store=None, resume=False, intervalo_min=3.0,
+                       base_url='https://web.whatsapp.com', max_amostra=MAX_AMOSTRA):
+    """
+    Pré-verificação da campanha, sem Chrome: lê a planilha inteira em blocos, normaliza e
+    deduplica os números, valida o template e estima a duração do envio.
+    `store` (SentStore) é usado para pular os já enviados (`resume`) e para o tempo médio
+    dos últimos envios; sem histórico a estimativa usa apenas `intervalo_min`.
+    São listadas até `max_amostra` linhas rejeitadas (None = todas).
+    Retorna o relatório (dict); `erro` é preenchido se a campanha não puder ser enviada.
+    """
+    relatorio = {'erro': None, 'total': 0, 'validos': 0, 'rejeitados': 0, 'duplicados': 0,
+                 'pulados': 0, 'motivos': {}, 'amostra': [], 'segundos_por_contato': intervalo_min,
+                 'historico': False, 'eta_segundos': 0.0}
+    try:
+        partes, erro = validar_template(path, template)
+        if erro:
+            relatorio['erro'] = erro
+            return relatorio
+        relatorio['total'] = contar_linhas(path)
+
+        motivos = Counter()
+        for validos, rejeitados in preparar_em_blocos(path, partes, link, base_url):
+            for linha, nome, numero, motivo in rejeitados.itertuples(index=False):
+                # 'Número duplicado (linha 5)' -> 'Número duplicado'
+                motivos[motivo.split(' (')[0]] += 1
+                if max_amostra is None or len(relatorio['amostra']) < max_amostra:
+                    relatorio['amostra'].append((linha + 1, nome, numero, motivo))
+            if resume and store is not None:
+                pulados = sum(store.ja_enviado(numero, msg) for numero, msg in zip(validos['numero'], validos['msg']))
+                relatorio['pulados'] += pulados
+                relatorio['validos'] += len(validos) - pulados
+            else:
+                relatorio['validos'] += len(validos)
+    except Exception as e:
+        relatorio['erro'] = f'Erro ao ler arquivo de contatos: {e}'
+        return relatorio
+
+    relatorio['motivos'] = dict(motivos.most_common())
+    relatorio['rejeitados'] = sum(motivos.values())
+    relatorio['duplicados'] = motivos.get('Número duplicado', 0)
+
+    # Cada contato leva o tempo do envio, mas nunca menos que o intervalo mínimo
+    medio = store.tempo_medio() if store is not None else None
+    if medio:
+        relatorio['historico'] = True
+        relatorio['segundos_por_contato'] = max(intervalo_min, medio)
+    relatorio['eta_segundos'] = relatorio['validos'] * relatorio['segundos_por_contato']
+    return relatorio
+
+
+def imprimir_relatorio(relatorio):
+    """Relatório da pré-verificação no formato do log."""
+    print(f"\n{'='*60}")
+    print("[PRE-VERIFICACAO] Nenhuma mensagem foi enviada")
+    if relatorio['erro']:
+        print(f"[ERRO] {relatorio['erro']}")
+        print(f"{'='*60}")
+        return
+    print(f"   Linhas na planilha: {relatorio['total']}")
+    print(f"   A enviar: {relatorio['validos']}")
+    print(f"   Rejeitados: {relatorio['rejeitados']} (duplicados: {relatorio['duplicados']})")
+    if relatorio['pulados']:
+        print(f"   Pulados (já enviados): {relatorio['pulados']}")
+    for motivo, n in relatorio['motivos'].items():
+        print(f"      {n:>6}  {motivo}")
+    base = 'média dos últimos envios' if relatorio['historico'] else 'intervalo mínimo, sem histórico'
+    print(f"   Duração estimada: {formatar_duracao(relatorio['eta_segundos'])} "
+          f"({relatorio['segundos_por_contato']:.1f} s por contato, {base})")
+    for linha, nome, numero, motivo in relatorio['amostra']:
+        print(f"[REJEITADO] Linha {linha}: {motivo} ({nome or '-'}: {numero or '-'})")
+    if relatorio['rejeitados'] > len(relatorio['amostra']):
+        print(f"   ... e mais {relatorio['rejeitados'] - len(relatorio['amostra'])} linhas rejeitadas")
+    print(f"{'='*60}")
@@ -5,173 +5,637 @@ import os
 # Configurar encoding UTF-8 para Windows - DEVE SER A PRIMEIRA COISA
 if sys.platform == 'win32':
     import io
-    # Reconfigurar stdout e stderr com UTF-8
+    # Reconfigurar stdout e stderr com UTF-8 (linha a linha: a saída do worker vai por pipe para o log)
     if hasattr(sys.stdout, 'buffer'):
-        sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8', errors='replace')
+        sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8', errors='replace', line_buffering=True)
     if hasattr(sys.stderr, 'buffer'):
-        sys.stderr = io.TextIOWrapper(sys.stderr.buffer, encoding='utf-8', errors='replace')
+        sys.stderr = io.TextIOWrapper(sys.stderr.buffer, encoding='utf-8', errors='replace', line_buffering=True)
     # Configurar variável de ambiente
     os.environ['PYTHONIOENCODING'] = 'utf-8'
 
+import json
 import time
+import queue
+import itertools
 import tempfile
 import shutil
-import pandas as pd
-from urllib.parse import quote
-from selenium import webdriver
-from selenium.webdriver.chrome.options import Options
+import signal
+import threading
+from multiprocessing.connection import Listener
+from contatos import arquivo_contatos, contar_linhas, estimar_linhas, preparar_em_blocos, validar_template
+from sent_store import SentStore
+from worker_ipc import worker_address, worker_authkey
+from eventos import EventBus
+from preflight import imprimir_relatorio, verificar_campanha
+# Apenas os módulos leves do Selenium no topo. webdriver e support.ui (~0,3 s de import)
+# são importados dentro das funções que usam o Chrome, depois da leitura dos contatos.
 from selenium.webdriver.common.by import By
 from selenium.webdriver.common.keys import Keys
-from selenium.webdriver.support.ui import WebDriverWait
-from selenium.webdriver.support import expected_conditions as EC
-from selenium.common.exceptions import WebDriverException
+from selenium.common.exceptions import WebDriverException, TimeoutException
 
 # Tornar o sistema portável - usar caminho relativo ao script
 SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
 DATA_DIR = os.path.join(SCRIPT_DIR, 'data')
-SENT_LOG = os.path.join(DATA_DIR, 'sent_log.csv')
-os.makedirs(DATA_DIR, exist_ok=True)
-open(SENT_LOG, 'a+', encoding='utf-8').close()
-
-# Template e link vêm do frontend via env
-template = os.getenv('MSG_TEMPLATE', 'Olá {nome}, tudo bem?')
-link = os.getenv('MSG_LINK', '').strip()
-USE_PROFILE = os.getenv('USE_PROFILE', 'false').lower() == 'true'
-
-# Configurar Chrome - SEM perfil persistente (portável)
-opts = Options()
-opts.add_argument("--no-sandbox")
-opts.add_argument("--disable-dev-shm-usage")
-opts.add_argument("--disable-gpu")
-opts.add_argument("--remote-debugging-pipe")
-# NÃO usar headless - precisa estar visível para login e envio
-# opts.add_argument("--headless")  # Comentado - precisa estar visível
-opts.add_experimental_option("prefs", {
-    "download.prompt_for_download": False,
-})
-# Desabilitar notificações
-opts.add_argument("--disable-notifications")
-
-# Se não usar perfil, criar um temporário que será removido após o uso
-temp_profile = None
-if not USE_PROFILE:
-    # Criar perfil temporário que será removido ao final
-    temp_profile = tempfile.mkdtemp(prefix='whatsapp_temp_')
-    opts.add_argument(f"user-data-dir={temp_profile}")
-    print(f"[MODO PORTAVEL] Usando perfil temporario (sera removido ao final)")
-else:
-    # Usar perfil persistente (opcional)
-    PROFILE = os.path.join(SCRIPT_DIR, 'profile')
-    opts.add_argument(f"user-data-dir={PROFILE}")
-    print(f"[MODO PERSISTENTE] Usando perfil em {PROFILE}")
-
-driver = None
-for attempt in range(3):
+SENT_LOG = os.path.join(DATA_DIR, 'sent_log.csv')  # Histórico antigo (importado no primeiro uso)
+SENT_DB = os.path.join(DATA_DIR, 'envios.db')
+CONTATOS_FILE = arquivo_contatos(DATA_DIR)  # contatos.xlsx ou contatos.csv
+PROFILE = os.path.join(SCRIPT_DIR, 'profile')
+# Modo portável com cache de arquivos: o cache HTTP e o código JS compilado do WhatsApp Web
+# ficam em cache/ entre execuções; cookies, IndexedDB e a sessão continuam no perfil temporário
+ASSET_CACHE = os.getenv('ASSET_CACHE', 'false').lower() == 'true'
+CACHE_DIR = os.path.join(SCRIPT_DIR, 'cache')
+# Modo leve: a aba do WhatsApp não carrega imagens, mídia nem fontes e o Chrome roda sem
+# extensões, sincronização e tarefas de fundo (menos CPU e memória em máquinas pequenas)
+LEAN_BROWSER = os.getenv('LEAN_BROWSER', 'false').lower() == 'true'
+LEAN_FLAGS = (
+    "--disable-extensions",
+    "--disable-sync",
+    "--disable-background-networking",
+    "--disable-component-update",
+    "--disable-default-apps",
+    "--disable-domain-reliability",
+    "--disable-client-side-phishing-detection",
+    "--disable-features=Translate,MediaRouter,OptimizationHints,AutofillServerCommunication",
+    "--no-first-run",
+    "--no-default-browser-check",
+    "--metrics-recording-only",
+    "--mute-audio",
+)
+# Bloqueados na aba do WhatsApp no modo leve (CDP Network.setBlockedURLs): fontes, áudio/vídeo
+# e os servidores de mídia e fotos de perfil. As imagens já são desligadas pelas preferências.
+LEAN_BLOCKED_URLS = [
+    '*.woff', '*.woff2', '*.ttf', '*.otf',
+    '*.mp3', '*.mp4', '*.ogg', '*.opus', '*.webm', '*.wav',
+    '*://mmg.whatsapp.net/*', '*://media*.whatsapp.net/*', '*://pps.whatsapp.net/*',
+]
+SELECTOR_CACHE = os.path.join(DATA_DIR, 'selectors.json')
+# Endereço do WhatsApp Web (pode apontar para a página falsa do benchmark, ver bench/)
+WHATSAPP_URL = os.getenv('WHATSAPP_URL', 'https://web.whatsapp.com').rstrip('/')
+
+# Ritmo de envio: intervalo mínimo (segundos) entre o início de dois contatos.
+# As esperas são guiadas pela página; este piso só existe para limitar o ritmo de propósito.
+MIN_INTERVAL = float(os.getenv('SEND_MIN_INTERVAL', '3'))
+# Tempo máximo para o WhatsApp pré-preencher o campo e para confirmar o envio
+PREFILL_TIMEOUT = float(os.getenv('PREFILL_TIMEOUT', '10'))
+SEND_TIMEOUT = float(os.getenv('SEND_TIMEOUT', '10'))
+# Resultado de enviar_texto quando Enter foi pressionado sem o texto completo no campo ou sem o
+# campo esvaziar depois: a mensagem pode não ter saído (não conta como enviada nem para Retomar)
+NAO_CONFIRMADO = 'nao_confirmado'
+# Tempo máximo para o login (QR Code) no WhatsApp Web
+LOGIN_TIMEOUT = float(os.getenv('LOGIN_TIMEOUT', '120'))
+# Navegação entre conversas: 'url' recarrega o WhatsApp Web a cada contato (send?phone=...);
+# 'app' (experimental) tenta abrir a conversa dentro do app já carregado e volta para 'url' se
+# não conseguir. Não há garantia de que o WhatsApp Web intercepte o link: se a página navegar,
+# o contato paga a tentativa e mais a navegação por URL.
+NAV_MODE = os.getenv('NAV_MODE', 'url').lower()
+NAV_TIMEOUT = float(os.getenv('NAV_TIMEOUT', '5'))
+# Ao abrir uma conversa, espera-se o que vier primeiro: o rodapé da conversa (chat aberto)
+# ou o aviso de número inválido. CHAT_TIMEOUT limita a espera pela conversa; o aviso é
+# procurado apenas nos primeiros INVALID_TIMEOUT segundos (padrão: o mesmo CHAT_TIMEOUT).
+CHAT_TIMEOUT = float(os.getenv('CHAT_TIMEOUT', '30'))
+INVALID_TIMEOUT = float(os.getenv('INVALID_TIMEOUT', str(CHAT_TIMEOUT)))
+# Falhas seguidas da navegação no app antes de usar só a URL no resto da campanha
+NAV_MAX_FALHAS = 3
+
+def config_do_ambiente():
+    """Configuração da campanha vinda do frontend via env"""
+    return {
+        'template': os.getenv('MSG_TEMPLATE', 'Olá {nome}, tudo bem?'),
+        'link': os.getenv('MSG_LINK', '').strip(),
+        # Retomar campanha: pular contatos que já receberam esta mesma mensagem
+        'resume': os.getenv('RESUME', 'false').lower() == 'true',
+    }
+
+def preparar_campanha(config, store):
+    """
+    Abre a planilha de contatos ANTES de usar o Chrome.
+    Os contatos são lidos e preparados em blocos, à medida que o envio avança
+    (memória constante), e o primeiro contato a enviar já vem preparado.
+    `total` começa como estimativa (dimensão gravada no .xlsx) e é trocado pela contagem
+    exata, feita em segundo plano ou ao fim da leitura, sem atrasar o primeiro envio.
+    Retorna a campanha (dict) ou None se a planilha não puder ser lida.
+    """
+    template = config['template']
+    link = (config.get('link') or '').strip()
+
+    if not os.path.exists(CONTATOS_FILE):
+        print(f"ERRO: Arquivo {CONTATOS_FILE} não encontrado!")
+        return None
+
+    # Template compilado uma vez e conferido contra as colunas da planilha antes do Chrome
+    try:
+        partes, erro = validar_template(CONTATOS_FILE, template)
+        total = estimar_linhas(CONTATOS_FILE)
+    except Exception as e:
+        print(f"ERRO ao ler arquivo de contatos: {e}")
+        return None
+    if erro:
+        print(f"ERRO: {erro}")
+        return None
+
+    blocos = preparar_em_blocos(CONTATOS_FILE, partes, link, base_url=WHATSAPP_URL)
+    # Os envios (e rejeições) desta campanha ficam ligados ao template no registro
+    store.iniciar_campanha(template, link)
+
+    campanha = {'total': total or 0, 'contatos': iter(()), 'validos': 0, 'rejeitados': 0, 'pulados': 0,
+                'lida': False}
+    if total:
+        print(f"Encontrados cerca de {total} contatos para processar")
+
+    def contar():
+        """Contagem exata em segundo plano; enviar_campanha emite o novo total entre contatos."""
+        try:
+            exato = contar_linhas(CONTATOS_FILE)
+        except Exception:
+            return
+        if not campanha['lida']:
+            campanha['total'] = exato
+    print(f"Template de mensagem: {template}")
+    if link:
+        print(f"Link adicional: {link}")
+
+    def contatos():
+        """Gera (linha, nome, numero, msg, url) de cada contato a enviar, bloco a bloco"""
+        for validos, rejeitados in blocos:
+            for linha, nome, numero, motivo in rejeitados.itertuples(index=False):
+                print(f"[ERRO] Linha {linha+1}: {motivo} ({nome or '-'}: {numero or '-'})")
+                store.registrar(numero, None, 'erro', linha=linha, nome=nome, erro=motivo, tipo='rejeitado')
+            campanha['rejeitados'] += len(rejeitados)
+            # O registro de envios também é o índice de envios já realizados (número + hash da mensagem)
+            if config.get('resume'):
+                ja_enviados = [store.ja_enviado(numero, msg) for numero, msg in zip(validos['numero'], validos['msg'])]
+                pulados = sum(ja_enviados)
+                if pulados:
+                    validos = validos[[not e for e in ja_enviados]]
+                    campanha['pulados'] += pulados
+                    print(f"[RETOMAR] {pulados} contatos já receberam esta mensagem e serão pulados")
+            campanha['validos'] += len(validos)
+            yield from validos.itertuples(index=False)
+        # Planilha lida até o fim: o total exato são as linhas lidas
+        campanha['lida'] = True
+        campanha['total'] = campanha['validos'] + campanha['rejeitados'] + campanha['pulados']
+
+    # Preparar até o primeiro contato a enviar: sem nenhum, o Chrome nem precisa ser usado
+    try:
+        fila = contatos()
+        primeiro = next(fila, None)
+    except Exception as e:
+        print(f"ERRO ao ler arquivo de contatos: {e}")
+        return None
+    store.flush()
+    if primeiro is None:
+        # Vazio é decidido pelas linhas lidas, não pela contagem (metadados da planilha)
+        if not campanha['rejeitados'] and not campanha['pulados']:
+            print("AVISO: Arquivo de contatos está vazio!")
+            return campanha
+        print(f"Contatos válidos: 0 | Rejeitados: {campanha['rejeitados']}")
+        print("AVISO: Nenhum contato válido para enviar!")
+        return campanha
+
+    campanha['contatos'] = itertools.chain([primeiro], fila)
+    if not campanha['lida']:
+        threading.Thread(target=contar, daemon=True).start()
+    return campanha
+
+def restaurar_cache_codigo(cache_dir, temp_profile):
+    """Copia o código JS já compilado (V8) do cache para o perfil temporário."""
+    origem = os.path.join(cache_dir, 'Code Cache')
+    if os.path.isdir(origem):
+        try:
+            shutil.copytree(origem, os.path.join(temp_profile, 'Default', 'Code Cache'), dirs_exist_ok=True)
+        except Exception as e:
+            print(f"[AVISO] Nao foi possivel restaurar o cache de codigo: {str(e)}")
+
+def salvar_cache_codigo(temp_profile, cache_dir):
+    """Guarda o código JS compilado do perfil temporário (com o Chrome já fechado)."""
+    origem = os.path.join(temp_profile, 'Default', 'Code Cache')
+    if not os.path.isdir(origem):
+        return
+    destino = os.path.join(cache_dir, 'Code Cache')
+    novo = destino + '.novo'
+    try:
+        shutil.rmtree(novo, ignore_errors=True)
+        shutil.copytree(origem, novo)
+        shutil.rmtree(destino, ignore_errors=True)
+        os.replace(novo, destino)
+    except Exception as e:
+        print(f"[AVISO] Nao foi possivel salvar o cache de codigo: {str(e)}")
+
+def bloquear_recursos(driver):
+    """Modo leve: impede a aba de baixar fontes, áudio/vídeo e mídia do WhatsApp."""
+    try:
+        driver.execute_cdp_cmd('Network.enable', {})
+        driver.execute_cdp_cmd('Network.setBlockedURLs', {'urls': LEAN_BLOCKED_URLS})
+    except Exception as e:
+        print(f"[AVISO] Nao foi possivel bloquear midia e fontes: {str(e)}")
+
+def iniciar_driver(use_profile, headless=False, cache_dir=None, lean=False):
+    """
+    Abre o Chrome. Retorna (driver, perfil_temporario).
+    `headless` é usado apenas pelo benchmark (bench/); o envio real precisa do Chrome visível.
+    `cache_dir` (modo portável): pasta com o cache HTTP e o cache de código mantidos entre
+    execuções. Só guarda arquivos do WhatsApp Web; a sessão continua no perfil temporário.
+    `lean`: modo leve (LEAN_BROWSER), sem imagens, mídia, fontes e recursos de fundo do Chrome.
+    """
+    from selenium import webdriver
+    from selenium.webdriver.chrome.options import Options
+
+    # Configurar Chrome - SEM perfil persistente (portável)
+    opts = Options()
+    opts.add_argument("--no-sandbox")
+    opts.add_argument("--disable-dev-shm-usage")
+    opts.add_argument("--disable-gpu")
+    opts.add_argument("--remote-debugging-pipe")
+    # NÃO usar headless - precisa estar visível para login e envio
+    # opts.add_argument("--headless")  # Comentado - precisa estar visível
+    prefs = {
+        "download.prompt_for_download": False,
+    }
+    # Desabilitar notificações
+    opts.add_argument("--disable-notifications")
+    if lean:
+        for flag in LEAN_FLAGS:
+            opts.add_argument(flag)
+        # O QR Code é um canvas e o botão de enviar é SVG: ficam visíveis sem imagens
+        prefs["profile.managed_default_content_settings.images"] = 2
+        print("[LEVE] Modo leve: sem imagens, midia e fontes; extensoes e tarefas de fundo desligadas")
+    opts.add_experimental_option("prefs", prefs)
+    if headless:
+        opts.add_argument("--headless=new")
+
+    # Se não usar perfil, criar um temporário que será removido após o uso
+    temp_profile = None
+    if not use_profile:
+        # Criar perfil temporário que será removido ao final. O painel informa a pasta em
+        # TEMP_PROFILE para poder removê-la se precisar encerrar o worker à força.
+        temp_profile = os.getenv('TEMP_PROFILE')
+        if temp_profile:
+            os.makedirs(temp_profile, exist_ok=True)
+        else:
+            temp_profile = tempfile.mkdtemp(prefix='whatsapp_temp_')
+        opts.add_argument(f"user-data-dir={temp_profile}")
+        print(f"[MODO PORTAVEL] Usando perfil temporario (sera removido ao final)")
+        if cache_dir:
+            # O cache HTTP fica fora do perfil; o de código é copiado para dentro dele
+            opts.add_argument(f"--disk-cache-dir={os.path.join(cache_dir, 'http')}")
+            restaurar_cache_codigo(cache_dir, temp_profile)
+            print(f"[CACHE] Usando cache de arquivos em {cache_dir} (sem cookies nem sessao)")
+    else:
+        # Usar perfil persistente (opcional)
+        opts.add_argument(f"user-data-dir={PROFILE}")
+        print(f"[MODO PERSISTENTE] Usando perfil em {PROFILE}")
+
+    driver = None
+    for attempt in range(3):
+        try:
+            driver = webdriver.Chrome(options=opts)
+            break
+        except WebDriverException as e:
+            print(f"[sender] Tentativa {attempt+1} falhou:", e)
+            time.sleep(5)
+    if driver is None:
+        remover_perfil(temp_profile)
+        raise RuntimeError("ChromeDriver falhou após várias tentativas")
+    if lean:
+        bloquear_recursos(driver)
+    return driver, temp_profile
+
+# Estado da sessão do WhatsApp Web detectado pelo DOM: 'qr', 'carregando' ou 'pronto'
+SESSION_STATE_JS = """
+if (document.querySelector('#pane-side, [aria-label="Chat list"], [aria-label="Lista de conversas"]')) return 'pronto';
+if (document.querySelector('canvas[aria-label], div[data-ref]')) return 'qr';
+return 'carregando';
+"""
+
+def estado_sessao(driver):
+    try:
+        return driver.execute_script(SESSION_STATE_JS)
+    except WebDriverException:
+        return 'carregando'
+
+def aguardar_login(driver, use_profile, on_estado=None, cancelado=None):
+    """
+    Abre o WhatsApp Web e aguarda a lista de conversas aparecer (sessão pronta).
+    Retorna assim que o login estiver pronto; False se passar de LOGIN_TIMEOUT
+    ou se `cancelado()` ficar verdadeiro (pedido de parada durante o login).
+    `on_estado` é chamado a cada mudança de estado ('qr', 'carregando', 'pronto').
+    """
+    driver.get(WHATSAPP_URL)
+    modo = "[MODO PORTAVEL]" if not use_profile else "[MODO PERSISTENTE]"
+    print(f"\n{modo} Aguardando login no WhatsApp Web (até {LOGIN_TIMEOUT:.0f} segundos)...")
+
+    estado = None
+    limite = time.monotonic() + LOGIN_TIMEOUT
+    while time.monotonic() < limite:
+        if cancelado and cancelado():
+            print("[AVISO] Login cancelado: envio parado")
+            return False
+        novo = estado_sessao(driver)
+        if novo != estado:
+            estado = novo
+            if on_estado:
+                on_estado(estado)
+            if estado == 'qr':
+                print("[INFO] Escaneie o QR Code com seu celular.")
+            elif estado == 'carregando':
+                print("[INFO] Carregando o WhatsApp Web...")
+        if estado == 'pronto':
+            print("[OK] WhatsApp Web pronto. Continuando com os envios...")
+            return True
+        time.sleep(0.5)
+
+    print(f"[ERRO] Login não concluído em {LOGIN_TIMEOUT:.0f} segundos")
+    return False
+
+def remover_perfil(temp_profile):
+    """Limpar perfil temporário se foi usado"""
+    if temp_profile and os.path.exists(temp_profile):
+        try:
+            print(f"[LIMPEZA] Removendo perfil temporario...")
+            shutil.rmtree(temp_profile)
+            print(f"[OK] Perfil temporario removido")
+        except Exception as e:
+            print(f"[AVISO] Nao foi possivel remover perfil temporario: {str(e)}")
+
+def encerrar_driver(driver, temp_profile, cache_dir=None):
+    # Fechar driver
     try:
-        driver = webdriver.Chrome(options=opts)
-        break
-    except WebDriverException as e:
-        print(f"[sender] Tentativa {attempt+1} falhou:", e)
-        time.sleep(5)
-if driver is None:
-    raise RuntimeError("ChromeDriver falhou após várias tentativas")
-
-driver.get("https://web.whatsapp.com")
-
-# Aguardar um tempo para o WhatsApp carregar (sem verificação)
-if not USE_PROFILE:
-    print("\n[MODO PORTAVEL] Aguardando 20 segundos para você fazer login...")
-    print("[INFO] Escaneie o QR Code se necessário e aguarde o WhatsApp carregar.")
-    time.sleep(20)
-else:
-    print("[AGUARDANDO] 15 segundos para login no WhatsApp Web...")
-    time.sleep(15)
-
-wait = WebDriverWait(driver, 30)
-print("[OK] Continuando com os envios...")
+        driver.quit()
+    except Exception as e:
+        print(f"[AVISO] Erro ao fechar o Chrome: {str(e)}")
+    if cache_dir and temp_profile:
+        salvar_cache_codigo(temp_profile, cache_dir)
+    remover_perfil(temp_profile)
+
+def _texto_do_campo(driver, campo):
+    """Retorna o texto atual do campo de mensagem (contenteditable)."""
+    return (driver.execute_script("return arguments[0].innerText || arguments[0].textContent || '';", campo) or '').strip()
+
+def _texto_confere(texto_obtido, texto_esperado):
+    """Verifica se o texto está presente (100% ou pelo menos 95%)"""
+    if texto_obtido == texto_esperado:
+        return True
+    return len(texto_obtido) > 0 and len(texto_obtido) >= len(texto_esperado) * 0.95 and texto_esperado in texto_obtido
+
+# Seletores do botão de enviar (ícone dentro do botão ou o próprio botão)
+SEND_BUTTON_XPATH = "//footer//button[@aria-label='Enviar' or @aria-label='Send'] | //footer//span[@data-icon='send' or @data-icon='wds-ic-send-filled']/ancestor::button[1]"
+
+def _botao_enviar_habilitado(driver):
+    """Condição de espera: botão de enviar presente e habilitado."""
+    for botao in driver.find_elements(By.XPATH, SEND_BUTTON_XPATH):
+        if botao.is_displayed() and botao.is_enabled() and botao.get_attribute('aria-disabled') != 'true':
+            return botao
+    return False
+
+# Abre a conversa clicando em um link de envio dentro do app (experimental: só evita a recarga se
+# o WhatsApp Web interceptar o link). O #main atual é marcado para detectar a troca.
+OPEN_CHAT_JS = """
+var main = document.getElementById('main');
+if (main) main.setAttribute('data-bot-antigo', '1');
+window.__botSemRecarga = true;
+var a = document.createElement('a');
+a.href = arguments[0];
+document.body.appendChild(a);
+a.click();
+a.remove();
+"""
+
+# Desfecho da abertura de uma conversa, em uma única consulta ao DOM:
+# 'chat' (rodapé da nova conversa presente), 'invalido' (aviso de número inexistente) ou null.
+# arguments[0] = procurar o aviso de número inválido (falso depois de INVALID_TIMEOUT).
+DESFECHO_CHAT_JS = """
+var main = document.getElementById('main');
+if (main && !main.hasAttribute('data-bot-antigo')) {
+  for (var el = main.firstElementChild; el; el = el.nextElementSibling)
+    if (el.tagName === 'FOOTER') return 'chat';
+}
+if (arguments[0]) {
+  var aviso = /phone number|n[uú]mero de telefone/i;
+  var dialogos = document.querySelectorAll('[role="dialog"], [data-animate-modal-popup="true"]');
+  for (var i = 0; i < dialogos.length; i++)
+    if (aviso.test(dialogos[i].innerText)) return 'invalido';
+}
+return null;
+"""
+
+CHAT_ABERTO_JS = """
+if (!window.__botSemRecarga) return 'recarregou';
+""" + DESFECHO_CHAT_JS
+
+# Fecha o aviso de número inválido (necessário quando a página não é recarregada)
+FECHAR_AVISO_JS = """
+var dialogos = document.querySelectorAll('[role="dialog"], [data-animate-modal-popup="true"]');
+for (var i = 0; i < dialogos.length; i++) {
+  var botao = dialogos[i].querySelector('button');
+  if (botao) botao.click();
+}
+"""
+
+def aguardar_desfecho_chat(driver):
+    """
+    Espera a conversa abrir ou o aviso de número inválido, o que vier primeiro.
+    Retorna 'chat', 'invalido' ou None (nada apareceu em CHAT_TIMEOUT segundos).
+    """
+    from selenium.webdriver.support.ui import WebDriverWait
+    inicio = time.monotonic()
+    try:
+        return WebDriverWait(driver, CHAT_TIMEOUT, poll_frequency=0.1).until(
+            lambda d: d.execute_script(DESFECHO_CHAT_JS, time.monotonic() - inicio <= INVALID_TIMEOUT))
+    except TimeoutException:
+        return None
+
+def abrir_chat_no_app(driver, numero):
+    """
+    Abre a conversa com `numero` dentro do WhatsApp Web já carregado, sem recarregar a página.
+    Retorna 'chat' se a nova conversa abriu, 'invalido' se o WhatsApp avisou que o número
+    não existe, ou None para usar a navegação por URL.
+    """
+    from selenium.webdriver.support.ui import WebDriverWait
+    try:
+        driver.execute_script(OPEN_CHAT_JS, f"https://api.whatsapp.com/send?phone={numero}")
+        resultado = WebDriverWait(driver, NAV_TIMEOUT, poll_frequency=0.1).until(
+            lambda d: d.execute_script(CHAT_ABERTO_JS, True))
+    except (TimeoutException, WebDriverException):
+        return None
+    return resultado if resultado in ('chat', 'invalido') else None
+
+# Avalia todos os XPaths candidatos em uma única consulta ao DOM e retorna o primeiro elemento
+# visível do primeiro XPath que encontrar algum; com arguments[1] (seletor CSS) só valem elementos
+# dentro desse contêiner (ex.: a caixa de busca também é um textbox editável)
+FIND_FIRST_JS = """
+var xpaths = arguments[0], dentro = arguments[1];
+for (var i = 0; i < xpaths.length; i++) {
+    var nos = document.evaluate(xpaths[i], document, null, XPathResult.ORDERED_NODE_SNAPSHOT_TYPE, null);
+    for (var j = 0; j < nos.snapshotLength; j++) {
+        var el = nos.snapshotItem(j);
+        if (dentro && !(el.closest && el.closest(dentro))) continue;
+        if (el.offsetWidth || el.offsetHeight || el.getClientRects().length) return [i, el];
+    }
+}
+return null;
+"""
+
+class SeletorAprendido:
+    """
+    Lista de seletores candidatos para um elemento, com o último que funcionou em primeiro lugar.
+    O vencedor é lembrado durante a sessão e salvo em data/selectors.json para as próximas execuções.
+    `falhas` conta quantas vezes o seletor lembrado deixou de funcionar (mudança na interface).
+    `dentro` (seletor CSS) restringe os elementos aceitos a esse contêiner: um candidato genérico
+    que encontre outro elemento (ex.: a caixa de busca) nunca vira o vencedor.
+    """
+
+    def __init__(self, nome, candidatos, path=SELECTOR_CACHE, dentro=None):
+        self.nome = nome
+        self.candidatos = list(candidatos)
+        self.path = path
+        self.dentro = dentro
+        self.falhas = 0
+        self.vencedor = self.candidatos[0]
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                salvo = json.load(f).get(nome, {})
+            if salvo.get('xpath') in self.candidatos:
+                self.vencedor = salvo['xpath']
+            self.falhas = int(salvo.get('falhas', 0))
+        except (OSError, ValueError):
+            pass
+
+    def ordem(self):
+        return [self.vencedor] + [c for c in self.candidatos if c != self.vencedor]
+
+    def _salvar(self):
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                dados = json.load(f)
+        except (OSError, ValueError):
+            dados = {}
+        dados[self.nome] = {'xpath': self.vencedor, 'falhas': self.falhas}
+        try:
+            with open(self.path, 'w', encoding='utf-8') as f:
+                json.dump(dados, f, indent=2)
+        except OSError as e:
+            print(f"[AVISO] Não foi possível salvar o cache de seletores: {e}")
+
+    def localizar(self, wait):
+        """Aguarda (com o `wait` informado) o primeiro candidato visível. Retorna o elemento ou None."""
+        ordem = self.ordem()
+        try:
+            i, elemento = wait.until(lambda d: d.execute_script(FIND_FIRST_JS, ordem, self.dentro))
+        except TimeoutException:
+            self.falhas += 1
+            self._salvar()
+            print(f"[AVISO] Nenhum seletor encontrou '{self.nome}' (falhas acumuladas: {self.falhas})")
+            return None
+        if i != 0:
+            # O seletor lembrado não funcionou mais: aprender o novo vencedor
+            self.falhas += 1
+            self.vencedor = ordem[i]
+            self._salvar()
+            print(f"[AVISO] Seletor de '{self.nome}' mudou para: {self.vencedor[:50]}... (falhas acumuladas: {self.falhas})")
+        return elemento
+
+# Múltiplos seletores para o campo de mensagem (só vale o campo no rodapé da conversa aberta)
+campo_mensagem = SeletorAprendido('campo_mensagem', [
+    "//div[@contenteditable='true'][@data-tab='10']",  # Seletor mais específico
+    "//footer//div[@contenteditable='true']",  # Seletor original
+    "//div[@contenteditable='true'][@role='textbox']",  # Alternativa
+    "//div[@id='main']//footer//div[@contenteditable='true']",  # Mais específico
+    "//p[@class='selectable-text copyable-text']//..//..//div[@contenteditable='true']",  # Alternativa
+], dentro='#main footer')
+
+# Insere o texto no campo como se fosse digitado (mantém quebras de linha sem enviar)
+INSERIR_TEXTO_JS = """
+arguments[0].focus();
+document.execCommand('selectAll', false, null);
+document.execCommand('insertText', false, arguments[1]);
+"""
 
 # Função para enviar mensagem de texto
-def enviar_texto(driver, wait, texto):
+def enviar_texto(driver, wait, texto, tempos=None, preencher=False, timeouts=None):
     """
     Envia uma mensagem de texto no WhatsApp Web.
-    Verifica se a mensagem foi preenchida, aguarda 5 segundos e pressiona Enter.
+    Aguarda a mensagem ser pré-preenchida e o botão de enviar ficar habilitado,
+    pressiona Enter e confirma o envio quando o campo é esvaziado.
+    Com `preencher=True` (conversa aberta sem a URL de envio) o texto é inserido no campo.
+    Se `tempos` for informado, registra a duração das fases campo, preenchimento e envio.
+    Se `timeouts` for informado, recebe o nome de cada espera que atingiu o tempo limite.
+    Retorna True (envio confirmado), False (nada foi enviado) ou NAO_CONFIRMADO.
     """
+    from selenium.webdriver.support.ui import WebDriverWait
+    tempos = {} if tempos is None else tempos
+    timeouts = [] if timeouts is None else timeouts
+    inicio = time.monotonic()
     try:
         print(f"[DEBUG] Verificando mensagem pré-preenchida: {texto[:50]}...")
         
-        # Múltiplos seletores para o campo de mensagem
-        seletores = [
-            "//div[@contenteditable='true'][@data-tab='10']",  # Seletor mais específico
-            "//footer//div[@contenteditable='true']",  # Seletor original
-            "//div[@contenteditable='true'][@role='textbox']",  # Alternativa
-            "//div[@id='main']//footer//div[@contenteditable='true']",  # Mais específico
-            "//p[@class='selectable-text copyable-text']//..//..//div[@contenteditable='true']",  # Alternativa
-        ]
-        
-        campo = None
-        for seletor in seletores:
-            try:
-                campo = wait.until(EC.presence_of_element_located((By.XPATH, seletor)))
-                if campo and campo.is_displayed():
-                    print(f"[DEBUG] Campo encontrado com seletor: {seletor[:50]}...")
-                    break
-            except:
-                continue
+        # Todos os seletores em uma consulta por tentativa, começando pelo último que funcionou
+        campo = campo_mensagem.localizar(wait)
         
+        tempos['campo'] = time.monotonic() - inicio
         if not campo:
+            timeouts.append('campo')
             print("[ERRO] Não foi possível encontrar o campo de mensagem")
             return False
         
         # Scroll até o campo
         driver.execute_script("arguments[0].scrollIntoView(true);", campo)
-        time.sleep(0.5)
+        if preencher:
+            driver.execute_script(INSERIR_TEXTO_JS, campo, texto)
         
-        # Aguardar para o WhatsApp pré-preencher pela URL
+        # Aguardar o WhatsApp pré-preencher pela URL (sai assim que o texto aparecer)
         print("[DEBUG] Aguardando mensagem ser preenchida...")
-        time.sleep(3)
-        
-        # Verificar se o texto foi preenchido (pela URL ou manualmente)
         texto_esperado = texto.strip()
-        texto_no_campo = driver.execute_script("return arguments[0].innerText || arguments[0].textContent || '';", campo)
-        texto_obtido = texto_no_campo.strip()
-        
-        # Verificar se o texto está presente (100% ou pelo menos 95%)
         texto_preenchido = False
-        if texto_obtido == texto_esperado:
-            print(f"[DEBUG] Texto preenchido corretamente (100%) - {len(texto_obtido)} caracteres")
-            texto_preenchido = True
-        elif len(texto_obtido) > 0 and len(texto_obtido) >= len(texto_esperado) * 0.95 and texto_esperado in texto_obtido:
-            print(f"[DEBUG] Texto preenchido (aproximadamente {len(texto_obtido)} caracteres)")
+        try:
+            WebDriverWait(driver, PREFILL_TIMEOUT, poll_frequency=0.1).until(
+                lambda d: _texto_confere(_texto_do_campo(d, campo), texto_esperado))
             texto_preenchido = True
+        except TimeoutException:
+            timeouts.append('preenchimento')
         
-        if not texto_preenchido:
+        texto_obtido = _texto_do_campo(driver, campo)
+        tempos['preenchimento'] = time.monotonic() - inicio - tempos['campo']
+        if texto_preenchido:
+            print(f"[DEBUG] Texto preenchido ({len(texto_obtido)} caracteres)")
+        elif not texto_obtido.strip():
+            # Campo vazio: Enter não enviaria nada (e o campo "esvaziado" pareceria um envio)
+            print(f"[ERRO] O texto não foi preenchido no campo de mensagem")
+            return False
+        else:
             print(f"[AVISO] Texto pode não estar completamente preenchido (esperado: {len(texto_esperado)}, obtido: {len(texto_obtido)})")
-            print(f"[AVISO] Continuando mesmo assim...")
+            print(f"[AVISO] Continuando mesmo assim (o envio ficará como não confirmado)...")
         
         # Focar no campo
         try:
             campo.click()
         except:
             driver.execute_script("arguments[0].click();", campo)
-        time.sleep(0.5)
         
-        print(f"[DEBUG] Aguardando 5 segundos antes de enviar...")
-        # Aguardar 10 segundos após a mensagem ter sido preenchida
-        time.sleep(5)
+        # Aguardar o botão de enviar ficar habilitado
+        try:
+            WebDriverWait(driver, SEND_TIMEOUT, poll_frequency=0.1).until(_botao_enviar_habilitado)
+        except TimeoutException:
+            timeouts.append('botao')
+            print("[AVISO] Botão de enviar não detectado, pressionando Enter mesmo assim...")
         
         print(f"[DEBUG] Pressionando Enter para enviar...")
-        # Simplesmente pressionar Enter no teclado
+        inicio_envio = time.monotonic()
         campo.send_keys(Keys.ENTER)
-        time.sleep(2)
         
-        # Verificar se a mensagem foi enviada (campo deve estar vazio)
-        texto_apos_envio = driver.execute_script("return arguments[0].innerText || arguments[0].textContent || '';", campo)
-        if not texto_apos_envio.strip():
-            print("[OK] Mensagem enviada com sucesso!")
-            return True
-        else:
+        # Verificar se a mensagem foi enviada (campo deve ficar vazio)
+        confirmado = True
+        try:
+            WebDriverWait(driver, SEND_TIMEOUT, poll_frequency=0.1).until(
+                lambda d: not _texto_do_campo(d, campo))
+        except TimeoutException:
+            timeouts.append('confirmacao')
+            confirmado = False
             print(f"[AVISO] Campo ainda contém texto, mas Enter foi pressionado")
-            return True  # Retornar True mesmo assim
+        tempos['envio'] = time.monotonic() - inicio_envio
+        if not (confirmado and texto_preenchido):
+            return NAO_CONFIRMADO
+        print("[OK] Mensagem enviada com sucesso!")
+        return True
         
     except Exception as e:
         print(f"[ERRO] Erro ao enviar texto: {str(e)}")
@@ -179,146 +643,383 @@ def enviar_texto(driver, wait, texto):
         print(f"[DEBUG] Traceback: {traceback.format_exc()}")
         return False
 
-# Ler arquivo de contatos (portável - relativo ao script)
-contatos_file = os.path.join(SCRIPT_DIR, 'data', 'contatos.xlsx')
-if not os.path.exists(contatos_file):
-    print(f"ERRO: Arquivo {contatos_file} não encontrado!")
-    driver.quit()
-    exit(1)
-
-try:
-    df = pd.read_excel(contatos_file, dtype=str)
-    df.columns = df.columns.str.strip().str.lower()
-except Exception as e:
-    print(f"ERRO ao ler arquivo Excel: {e}")
-    driver.quit()
-    exit(1)
-
-if df.empty:
-    print("AVISO: Arquivo de contatos está vazio!")
-    driver.quit()
-    exit(0)
-
-print(f"Encontrados {len(df)} contatos para processar")
-print(f"Template de mensagem: {template}")
-if link:
-    print(f"Link adicional: {link}")
-
-enviados = 0
-erros = 0
-
-for idx, row in df.iterrows():
-    nome = row.get('nome') or row.get('name')
-    numero = row.get('telefone') or row.get('phone') or row.get('numero')
-    
-    if not nome or not numero:
-        print(f"[ERRO] Linha {idx+1}: Dados inválidos (nome ou número faltando)")
-        erros += 1
-        continue
-    
-    # Limpar número (remover espaços, hífens, parênteses, pontos)
-    numero = str(numero).strip().replace(' ', '').replace('-', '').replace('(', '').replace(')', '').replace('.', '').replace('+', '')
-    
-    # Verificar se o número é válido (deve ter pelo menos 10 dígitos)
-    if not numero.isdigit() or len(numero) < 10:
-        print(f"[ERRO] Linha {idx+1}: Número inválido para {nome}: {numero}")
-        erros += 1
-        continue
-    
-    # Adicionar código do país se não tiver (assumindo Brasil +55)
-    if len(numero) == 10 or len(numero) == 11:
-        # Número brasileiro sem código do país
-        if numero[0] == '0':
-            numero = '55' + numero[1:]  # Remove o 0 inicial
+def _sem_eventos(evento, **dados):
+    pass
+
+class ControleEnvio:
+    """
+    Pausa, retomada e parada do envio pedidas pelo canal local. São atendidas entre
+    um contato e outro, nunca no meio de um envio; pausado, o Chrome continua aberto
+    e logado, então retomar não custa nada.
+    """
+
+    def __init__(self):
+        self._liberado = threading.Event()
+        self._liberado.set()
+        self._parada = threading.Event()
+
+    @property
+    def pausado(self):
+        return not self._liberado.is_set()
+
+    @property
+    def parar(self):
+        return self._parada.is_set()
+
+    def pausar(self):
+        self._liberado.clear()
+
+    def retomar(self):
+        self._liberado.set()
+
+    def solicitar_parada(self):
+        self._parada.set()
+        self._liberado.set()  # uma campanha pausada também precisa sair da espera
+
+    def aguardar(self):
+        """Bloqueia enquanto estiver pausado. Retorna False se a parada foi pedida."""
+        self._liberado.wait()
+        return not self.parar
+
+    def esperar(self, segundos):
+        """Intervalo entre contatos, encurtado por um pedido de parada."""
+        self._parada.wait(segundos)
+
+def enviar_campanha(driver, campanha, store, emitir=_sem_eventos, controle=None):
+    """
+    Envia a mensagem para cada contato válido da campanha. Retorna o resumo.
+    `emitir(evento, **dados)` recebe os eventos de progresso (ver eventos.py).
+    `controle` (ControleEnvio) permite pausar e parar entre um contato e outro.
+    """
+    from selenium.webdriver.support.ui import WebDriverWait
+    wait = WebDriverWait(driver, 30)
+    enviados = 0
+    falhas = 0
+    usar_app = NAV_MODE == 'app'
+    falhas_nav = 0
+    parada = None  # linha em que o envio foi interrompido
+
+    def registrar(numero, msg, status, linha, nome, erro=None, tempos=None, timeouts=(), tipo=None):
+        """
+        Grava o resultado do contato no registro de envios e emite o evento.
+        `tipo` classifica a falha para as métricas (ver metricas.py).
+        """
+        try:
+            store.registrar(numero, msg, status, linha=linha, nome=nome, erro=erro, tempos=tempos, tipo=tipo)
+        except Exception as log_err:
+            print(f"AVISO: Erro ao registrar log: {log_err}")
+        if status == 'ok':
+            emitir('contato_ok', linha=linha, nome=nome, numero=numero, tempos=tempos, timeouts=list(timeouts))
         else:
-            numero = '55' + numero
+            emitir('contato_falha', linha=linha, nome=nome, numero=numero, motivo=erro, tipo=tipo,
+                   tempos=tempos, timeouts=list(timeouts))
 
-    try:
-        msg = template.format(nome=nome)
-    except KeyError as e:
-        print(f"[ERRO] Erro no template: variável {e} não encontrada. Use {{nome}} no template.")
-        erros += 1
-        continue
-    
-    if link:
-        msg += f" Confira: {link}"
-
-    # URL com texto - mensagem pré-preenchida pela URL (método original)
-    msg_encoded = quote(msg)
-    url = f"https://web.whatsapp.com/send?phone={numero}&text={msg_encoded}"
-    
-    print(f"\n[{idx+1}/{len(df)}] Enviando para: {nome} ({numero})")
-    print(f"[DEBUG] URL: {url}")
-    
-    try:
-        print(f"[DEBUG] Abrindo URL do WhatsApp...")
-        driver.get(url)
-        time.sleep(3)  # Aguardar página carregar
-        print(f"[DEBUG] Página carregada, aguardando footer...")
+    emitir('campanha_inicio', total=campanha['total'], validos=campanha['validos'],
+           rejeitados=campanha['rejeitados'], pulados=campanha['pulados'])
+    # Rejeitados, pulados e o total exato são conhecidos à medida que a planilha é lida
+    def contagem_atual():
+        return (campanha['rejeitados'], campanha['pulados'], campanha['total'])
+    contagem = contagem_atual()
+
+    for idx, nome, numero, msg, url in campanha['contatos']:
+        if controle is not None:
+            if controle.pausado:
+                store.flush()
+                print(f"[PAUSADO] Envio pausado antes da linha {idx+1} (o Chrome continua aberto)")
+                emitir('campanha_pausada', linha=idx)
+                if controle.aguardar():
+                    print(f"[RETOMADO] Continuando pela linha {idx+1}")
+                    emitir('campanha_retomada', linha=idx)
+            if controle.parar:
+                parada = idx
+                break
+        if contagem != contagem_atual():
+            contagem = contagem_atual()
+            emitir('campanha_contagem', rejeitados=contagem[0], pulados=contagem[1], total=contagem[2])
+        inicio_contato = time.monotonic()
+        tempos = {}
+        timeouts = []
         
-        # Esperar footer carregar (indica que o chat abriu) com timeout maior
-        try:
-            wait.until(EC.presence_of_element_located((By.XPATH, "//div[@id='main']/footer")))
-            print(f"[DEBUG] Footer encontrado, chat aberto!")
-            time.sleep(2)
-        except Exception as timeout_err:
-            print(f"[ERRO] Timeout ao abrir chat para {nome}. Verifique se o número está correto.")
-            print(f"[DEBUG] Erro: {str(timeout_err)}")
-            erros += 1
-            continue
+        print(f"\n[{idx+1}/{campanha['total']}] Enviando para: {nome} ({numero})")
+        emitir('contato_inicio', linha=idx, nome=nome, numero=numero)
+        print(f"[DEBUG] URL: {url}")
         
-        # Verificar se o número existe no WhatsApp
         try:
-            # Procurar mensagem de erro de número inválido
-            error_msg = driver.find_elements(By.XPATH, "//div[contains(text(), 'número de telefone') or contains(text(), 'phone number')]")
-            if error_msg:
-                print(f"ERRO: Número {numero} não encontrado no WhatsApp")
-                erros += 1
+            preencher = False
+            desfecho = abrir_chat_no_app(driver, numero) if usar_app else None
+            if desfecho:
+                print(f"[DEBUG] Conversa aberta no app (sem recarregar)")
+                preencher = True
+                falhas_nav = 0
+                tempos['pagina'] = time.monotonic() - inicio_contato
+                tempos['footer'] = 0.0
+            else:
+                if usar_app:
+                    falhas_nav += 1
+                    print(f"[AVISO] Não foi possível abrir a conversa no app, usando a URL")
+                    if falhas_nav >= NAV_MAX_FALHAS:
+                        usar_app = False
+                        print(f"[AVISO] {NAV_MAX_FALHAS} falhas seguidas: usando apenas a URL nesta campanha")
+                print(f"[DEBUG] Abrindo URL do WhatsApp...")
+                driver.get(url)
+                tempos['pagina'] = time.monotonic() - inicio_contato
+                print(f"[DEBUG] Página carregada, aguardando a conversa ou o aviso de número inválido...")
+                # O que vier primeiro: rodapé da conversa ou aviso de número inexistente
+                desfecho = aguardar_desfecho_chat(driver)
+                tempos['footer'] = time.monotonic() - inicio_contato - tempos['pagina']
+            
+            if desfecho is None:
+                print(f"[ERRO] Timeout ao abrir chat para {nome}. Verifique se o número está correto.")
+                falhas += 1
+                tempos['total'] = time.monotonic() - inicio_contato
+                timeouts.append('footer')
+                registrar(numero, msg, 'erro', idx, nome, 'Timeout ao abrir chat', tempos, timeouts, 'timeout_chat')
                 continue
-        except:
-            pass  # Continuar se não encontrar mensagem de erro
-        
-        # Sempre usar função enviar_texto para evitar duplicação
-        sucesso_envio = enviar_texto(driver, wait, msg)
-
-        if sucesso_envio:
-            print(f"[OK] Mensagem enviada para: {nome}")
             
-            # Registrar envio
-            try:
-                with open(SENT_LOG, 'a+', encoding='utf-8') as f:
-                    timestamp = time.strftime("%Y-%m-%d %H:%M:%S")
-                    f.write(f"{timestamp},{nome},{numero},{msg}\n")
-            except Exception as log_err:
-                print(f"AVISO: Erro ao registrar log: {log_err}")
+            if desfecho == 'invalido':
+                print(f"ERRO: Número {numero} não encontrado no WhatsApp")
+                try:
+                    driver.execute_script(FECHAR_AVISO_JS)
+                except WebDriverException:
+                    pass
+                falhas += 1
+                tempos['total'] = time.monotonic() - inicio_contato
+                registrar(numero, msg, 'erro', idx, nome, 'Número não encontrado no WhatsApp', tempos,
+                          timeouts, 'numero_invalido')
+                continue
+            print(f"[DEBUG] Footer encontrado, chat aberto!")
             
-            enviados += 1
-        else:
-            print(f"[FALHA] Falha ao enviar mensagem para: {nome}")
-            erros += 1
-
-    except Exception as ex:
-        print(f"[ERRO] Erro ao enviar para {nome}: {str(ex)}")
-        erros += 1
-    
-    # Delay entre envios
-    time.sleep(3)
-
-print(f"\n{'='*60}")
-print(f"[CONCLUIDO]")
-print(f"   Enviados: {enviados}")
-print(f"   Erros: {erros}")
-print(f"   Total: {len(df)}")
-print(f"{'='*60}")
-
-# Fechar driver
-driver.quit()
-
-# Limpar perfil temporário se foi usado
-if temp_profile and os.path.exists(temp_profile):
+            # Sempre usar função enviar_texto para evitar duplicação
+            sucesso_envio = enviar_texto(driver, wait, msg, tempos, preencher=preencher, timeouts=timeouts)
+            tempos['total'] = time.monotonic() - inicio_contato
+
+            if sucesso_envio is True:
+                print(f"[OK] Mensagem enviada para: {nome}")
+                registrar(numero, msg, 'ok', idx, nome, tempos=tempos, timeouts=timeouts)
+                enviados += 1
+            elif sucesso_envio == NAO_CONFIRMADO:
+                # Fica fora de 'ok': não entra nos enviados nem é pulado ao retomar
+                print(f"[AVISO] Envio para {nome} não confirmado (confira no WhatsApp)")
+                registrar(numero, msg, 'erro', idx, nome, 'Envio não confirmado', tempos, timeouts, NAO_CONFIRMADO)
+                falhas += 1
+            else:
+                print(f"[FALHA] Falha ao enviar mensagem para: {nome}")
+                tipo = 'campo_nao_encontrado' if 'campo' in timeouts else 'falha_envio'
+                registrar(numero, msg, 'erro', idx, nome, 'Falha ao enviar mensagem', tempos, timeouts, tipo)
+                falhas += 1
+
+        except Exception as ex:
+            print(f"[ERRO] Erro ao enviar para {nome}: {str(ex)}")
+            tempos['total'] = time.monotonic() - inicio_contato
+            registrar(numero, msg, 'erro', idx, nome, str(ex), tempos, timeouts, type(ex).__name__)
+            falhas += 1
+
+        finally:
+            # Delay entre contatos (também após número inválido ou timeout): apenas o que
+            # faltar para o intervalo mínimo
+            restante = MIN_INTERVAL - (time.monotonic() - inicio_contato)
+            if restante > 0:
+                if controle is not None:
+                    controle.esperar(restante)
+                else:
+                    time.sleep(restante)
+            emitir('intervalo', segundos=max(restante, 0))
+
+    # Checkpoint: tudo o que foi enviado até aqui fica gravado no registro de envios
+    store.flush()
+    total = campanha['total']
+    if contagem != contagem_atual():
+        emitir('campanha_contagem', rejeitados=campanha['rejeitados'], pulados=campanha['pulados'], total=total)
+    erros = falhas + campanha['rejeitados']
+    resumo = {'enviados': enviados, 'erros': erros, 'pulados': campanha['pulados'], 'total': total}
+    if parada is not None:
+        resumo['parada'] = parada
+    print(f"\n{'='*60}")
+    if parada is not None:
+        print(f"[PARADO] Envio interrompido antes da linha {parada+1}")
+        print(f"   Para continuar, inicie de novo com 'Retomar campanha' (os já enviados são pulados)")
+    else:
+        print(f"[CONCLUIDO]")
+    print(f"   Enviados: {enviados}")
+    print(f"   Erros: {erros}")
+    if resumo['pulados']:
+        print(f"   Pulados (já enviados): {resumo['pulados']}")
+    print(f"   Total: {total}")
+    print(f"{'='*60}")
+    emitir('campanha_fim', **resumo)
+    return resumo
+
+def executar_uma_vez(use_profile):
+    """Modo linha de comando: uma campanha (configurada via env) e encerra o Chrome no final."""
+    store = SentStore(SENT_DB, legacy_csv=SENT_LOG)
     try:
-        print(f"[LIMPEZA] Removendo perfil temporario...")
-        shutil.rmtree(temp_profile)
-        print(f"[OK] Perfil temporario removido")
-    except Exception as e:
-        print(f"[AVISO] Nao foi possivel remover perfil temporario: {str(e)}")
+        campanha = preparar_campanha(config_do_ambiente(), store)
+        if campanha is None:
+            sys.exit(1)
+        if not campanha['validos']:
+            sys.exit(0)
+
+        cache_dir = CACHE_DIR if ASSET_CACHE else None
+        driver, temp_profile = iniciar_driver(use_profile, cache_dir=cache_dir, lean=LEAN_BROWSER)
+        try:
+            if not aguardar_login(driver, use_profile):
+                sys.exit(1)
+            enviar_campanha(driver, campanha, store)
+        finally:
+            encerrar_driver(driver, temp_profile, cache_dir)
+    finally:
+        store.close()
+
+def executar_preflight():
+    """Modo --dry-run: pré-verificação da campanha (configurada via env), sem Chrome e sem envios."""
+    config = config_do_ambiente()
+    store = SentStore(SENT_DB, legacy_csv=SENT_LOG)
+    try:
+        relatorio = verificar_campanha(CONTATOS_FILE, config['template'], config['link'], store,
+                                       resume=config['resume'], intervalo_min=MIN_INTERVAL,
+                                       base_url=WHATSAPP_URL, max_amostra=None)
+    finally:
+        store.close()
+    imprimir_relatorio(relatorio)
+    sys.exit(1 if relatorio['erro'] else 0)
+
+class Worker:
+    """
+    Worker residente: mantém uma única sessão do Chrome com o WhatsApp Web carregado
+    e executa, em ordem, as campanhas recebidas pelo canal local (ver worker_ipc.py).
+    Comandos: 'campanha' (enfileira), 'status', 'pausar', 'retomar', 'encerrar' e 'eventos'
+    (a conexão passa a receber os eventos de progresso, ver eventos.py).
+    'encerrar' é uma parada suave: o contato atual termina, o que foi enviado fica gravado
+    e o worker sai fechando o Chrome e removendo o perfil temporário.
+    """
+
+    def __init__(self, use_profile):
+        self.use_profile = use_profile
+        self.jobs = queue.Queue()
+        self.ocupado = False
+        self.pronto = False
+        self.sessao = 'iniciando'
+        self.encerrando = False
+        self.eventos = EventBus()
+        self.controle = ControleEnvio()
+
+    def _atender(self, conn):
+        """Atende um cliente até ele desconectar."""
+        while True:
+            try:
+                pedido = conn.recv()
+            except (EOFError, OSError):
+                conn.close()
+                return
+            if pedido.get('cmd') == 'eventos':
+                # A conexão passa a ser do barramento de eventos
+                self.eventos.inscrever(conn)
+                return
+            conn.send(self._responder(pedido))
+
+    def _responder(self, pedido):
+        cmd = pedido.get('cmd')
+        if cmd == 'campanha':
+            if self.encerrando:
+                return {'ok': False, 'erro': 'worker encerrando'}
+            self.jobs.put({k: v for k, v in pedido.items() if k != 'cmd'})
+            return {'ok': True, 'fila': self.jobs.qsize()}
+        if cmd == 'status':
+            return {'ok': True, 'pronto': self.pronto, 'ocupado': self.ocupado,
+                    'fila': self.jobs.qsize(), 'use_profile': self.use_profile,
+                    'sessao': self.sessao, 'pausado': self.controle.pausado}
+        if cmd == 'pausar':
+            self.controle.pausar()
+            return {'ok': True}
+        if cmd == 'retomar':
+            self.controle.retomar()
+            return {'ok': True}
+        if cmd == 'encerrar':
+            self.encerrando = True
+            self.controle.solicitar_parada()
+            self.jobs.put(None)
+            return {'ok': True}
+        return {'ok': False, 'erro': f'comando desconhecido: {cmd}'}
+
+    def _vigiar_painel(self):
+        """
+        O painel mantém o stdin do worker aberto e nunca escreve nele: EOF significa que o painel
+        morreu sem encerrar o worker. Parada suave, como o comando 'encerrar'.
+        """
+        try:
+            while sys.stdin.buffer.read(4096):
+                pass
+        except (OSError, ValueError):
+            pass
+        # O stdout também era um pipe para o painel: descartar a saída a partir daqui
+        sys.stdout = sys.stderr = open(os.devnull, 'w', encoding='utf-8')
+        self._responder({'cmd': 'encerrar'})
+
+    def _escutar(self, listener):
+        while True:
+            try:
+                conn = listener.accept()
+            except Exception:
+                if self.encerrando:
+                    return
+                continue
+            threading.Thread(target=self._atender, args=(conn,), daemon=True).start()
+
+    def executar(self, job_inicial=None):
+        # O canal é aberto antes do Chrome: campanhas podem ser enfileiradas durante o login
+        listener = Listener(worker_address(), authkey=worker_authkey())
+        threading.Thread(target=self._escutar, args=(listener,), daemon=True).start()
+        print(f"[WORKER] Aguardando campanhas em {worker_address()[0]}:{worker_address()[1]}")
+        if os.getenv('WORKER_VIGIAR_PAINEL', 'false').lower() == 'true':
+            threading.Thread(target=self._vigiar_painel, daemon=True).start()
+        if job_inicial:
+            self.jobs.put(job_inicial)
+
+        store = SentStore(SENT_DB, legacy_csv=SENT_LOG)
+        cache_dir = CACHE_DIR if ASSET_CACHE else None
+        driver, temp_profile = iniciar_driver(self.use_profile, cache_dir=cache_dir, lean=LEAN_BROWSER)
+        try:
+            def on_estado(estado):
+                self.sessao = estado
+            if not aguardar_login(driver, self.use_profile, on_estado, cancelado=lambda: self.encerrando):
+                return
+            self.pronto = True
+            while True:
+                job = self.jobs.get()
+                if job is None or self.controle.parar:
+                    break
+                self.ocupado = True
+                self.controle.retomar()  # uma pausa pedida no fim da campanha anterior não vale para esta
+                try:
+                    campanha = preparar_campanha(job, store)
+                    if campanha is not None:
+                        enviar_campanha(driver, campanha, store, self.eventos.emitir, self.controle)
+                except Exception as e:
+                    print(f"[ERRO] Falha na campanha: {str(e)}")
+                finally:
+                    self.ocupado = False
+        finally:
+            self.encerrando = True
+            listener.close()
+            store.close()
+            encerrar_driver(driver, temp_profile, cache_dir)
+            print("[WORKER] Encerrado")
+
+def main():
+    use_profile = os.getenv('USE_PROFILE', 'false').lower() == 'true'
+    # SIGTERM (ou CTRL_BREAK_EVENT no Windows), o último recurso do painel antes de matar o
+    # processo, sai pelos finally: o Chrome é fechado e o perfil removido
+    signal.signal(signal.SIGTERM, lambda *_: sys.exit(1))
+    if hasattr(signal, 'SIGBREAK'):
+        signal.signal(signal.SIGBREAK, lambda *_: sys.exit(1))
+    if '--dry-run' in sys.argv:
+        executar_preflight()
+    elif '--worker' in sys.argv:
+        # A primeira campanha pode vir via env (MSG_TEMPLATE), as próximas pelo canal local
+        job_inicial = config_do_ambiente() if os.getenv('MSG_TEMPLATE') else None
+        Worker(use_profile).executar(job_inicial)
+    else:
+        executar_uma_vez(use_profile)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,161 @@
+import hashlib
+import os
+import re
+import sqlite3
+import time
+
+from busca import criar_indice_texto
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS envios (
+    id INTEGER PRIMARY KEY,
+    ts TEXT NOT NULL,
+    linha INTEGER,
+    nome TEXT,
+    numero TEXT NOT NULL,
+    msg TEXT,
+    msg_hash TEXT,
+    status TEXT NOT NULL,
+    erro TEXT,
+    t_pagina REAL,
+    t_footer REAL,
+    t_campo REAL,
+    t_preenchimento REAL,
+    t_envio REAL,
+    t_total REAL,
+    tipo TEXT,
+    campanha INTEGER
+);
+CREATE TABLE IF NOT EXISTS campanhas (
+    id INTEGER PRIMARY KEY,
+    ts TEXT NOT NULL,
+    template TEXT,
+    link TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_envios_numero ON envios(numero, msg_hash);
+CREATE INDEX IF NOT EXISTS idx_envios_status ON envios(status);
+CREATE INDEX IF NOT EXISTS idx_envios_ts ON envios(ts);
+"""
+
+COLUNAS = ('ts', 'linha', 'nome', 'numero', 'msg', 'msg_hash', 'status', 'erro',
+           't_pagina', 't_footer', 't_campo', 't_preenchimento', 't_envio', 't_total', 'tipo', 'campanha')
+# Colunas acrescentadas depois da primeira versão do banco (ALTER TABLE nos bancos antigos)
+COLUNAS_NOVAS = {'tipo': 'TEXT', 'campanha': 'INTEGER'}
+INSERT = f"INSERT INTO envios ({', '.join(COLUNAS)}) VALUES ({', '.join('?' * len(COLUNAS))})"
+
+# Início de um registro no sent_log.csv antigo
+INICIO_REGISTRO = re.compile(r'\d{4}-\d{2}-\d{2} \d{2}:\d{2}:\d{2},')
+
+
+def hash_mensagem(msg):
+    """Hash curto e estável do texto da mensagem."""
+    return hashlib.sha1(msg.encode('utf-8')).hexdigest()[:16]
+
+
+def conectar(path, readonly=False):
+    """Abre o banco de envios (WAL). Em modo somente leitura retorna None se ainda não existir."""
+    if readonly:
+        if not os.path.exists(path):
+            return None
+        return sqlite3.connect(f'file:{path}?mode=ro', uri=True, check_same_thread=False)
+    conn = sqlite3.connect(path, check_same_thread=False)
+    conn.execute('PRAGMA journal_mode=WAL')
+    conn.execute('PRAGMA synchronous=NORMAL')
+    conn.executescript(SCHEMA)
+    existentes = {linha[1] for linha in conn.execute('PRAGMA table_info(envios)')}
+    for coluna, tipo in COLUNAS_NOVAS.items():
+        if coluna not in existentes:
+            conn.execute(f'ALTER TABLE envios ADD COLUMN {coluna} {tipo}')
+    # Busca por trecho de nome/número no painel (busca.py); em bancos antigos indexa o histórico uma vez
+    criar_indice_texto(conn, 'envios', ('nome', 'numero'))
+    return conn
+
+
+class SentStore:
+    """
+    Registro estruturado dos envios (SQLite em modo WAL, somente anexação).
+    Mantém a conexão aberta e grava em lotes: confirma a cada `batch_size` registros
+    ou a cada `flush_interval` segundos. Também serve de índice dos envios já
+    realizados, chaveado por (número normalizado, hash da mensagem), com consulta O(1).
+    """
+
+    def __init__(self, path, legacy_csv=None, batch_size=50, flush_interval=1.0):
+        novo = not os.path.exists(path)
+        self.path = path
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.conn = conectar(path)
+        self.pending = []
+        self.last_flush = time.monotonic()
+        self.campanha = None
+        if novo and legacy_csv and os.path.exists(legacy_csv):
+            self._importar_csv(legacy_csv)
+        self.enviados = set(self.conn.execute(
+            "SELECT numero, msg_hash FROM envios WHERE status = 'ok'"))
+
+    def _importar_csv(self, legacy_csv):
+        """
+        Importa o histórico antigo de sent_log.csv (timestamp,nome,numero,mensagem).
+        A mensagem não era escapada: linhas que não começam com data/hora são
+        continuação da mensagem do registro anterior.
+        """
+        registros = []
+        with open(legacy_csv, 'r', encoding='utf-8', errors='replace') as f:
+            for line in f:
+                line = line.rstrip('\n')
+                partes = line.split(',', 3)
+                if len(partes) == 4 and INICIO_REGISTRO.match(line):
+                    registros.append(partes)
+                elif registros:
+                    registros[-1][3] += '\n' + line
+        rows = [(ts, None, nome, numero, msg, hash_mensagem(msg), 'ok', None,
+                 None, None, None, None, None, None, None, None)
+                for ts, nome, numero, msg in registros]
+        with self.conn:
+            self.conn.executemany(INSERT, rows)
+
+    def ja_enviado(self, numero, msg):
+        return (numero, hash_mensagem(msg)) in self.enviados
+
+    def tempo_medio(self, ultimos=200):
+        """Duração média (segundos) dos últimos envios com sucesso; None sem histórico."""
+        return self.conn.execute(
+            "SELECT AVG(t_total) FROM (SELECT t_total FROM envios WHERE status = 'ok' "
+            "AND t_total IS NOT NULL ORDER BY id DESC LIMIT ?)", (ultimos,)).fetchone()[0]
+
+    def iniciar_campanha(self, template, link=''):
+        """Registra o template da campanha; os envios seguintes ficam ligados a ela."""
+        with self.conn:
+            self.campanha = self.conn.execute(
+                'INSERT INTO campanhas (ts, template, link) VALUES (?, ?, ?)',
+                (time.strftime("%Y-%m-%d %H:%M:%S"), template, link)).lastrowid
+        return self.campanha
+
+    def registrar(self, numero, msg, status, linha=None, nome=None, erro=None, tempos=None, tipo=None):
+        """
+        Registra um envio (status 'ok' ou 'erro') com os tempos de cada fase em segundos.
+        `tipo` é a classe da falha (ver metricas.py), ou 'rejeitado' para linhas da planilha.
+        """
+        tempos = tempos or {}
+        h = hash_mensagem(msg) if msg is not None else None
+        if status == 'ok':
+            self.enviados.add((numero, h))
+        self.pending.append((
+            time.strftime("%Y-%m-%d %H:%M:%S"), linha, nome, numero, msg, h, status, erro,
+            tempos.get('pagina'), tempos.get('footer'), tempos.get('campo'),
+            tempos.get('preenchimento'), tempos.get('envio'), tempos.get('total'),
+            tipo, self.campanha,
+        ))
+        if len(self.pending) >= self.batch_size or time.monotonic() - self.last_flush >= self.flush_interval:
+            self.flush()
+
+    def flush(self):
+        if self.pending:
+            with self.conn:
+                self.conn.executemany(INSERT, self.pending)
+            self.pending = []
+        self.last_flush = time.monotonic()
+
+    def close(self):
+        self.flush()
+        self.conn.close()
@@ -0,0 +1,81 @@
+import os
+import threading
+
+from contatos import contar_linhas
+from sent_store import conectar
+
+
+def _file_key(path):
+    """Chave de cache do arquivo: (mtime, tamanho) ou None se não existir."""
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return (st.st_mtime_ns, st.st_size)
+
+
+class StatsCache:
+    """
+    Cache das estatísticas de envio.
+    Reconta os contatos apenas quando a planilha muda (mtime/tamanho) e refaz a
+    contagem de enviados apenas quando o banco de envios recebe novas gravações.
+    A recontagem dos contatos (segundos em planilhas grandes) roda em uma thread: `get()`
+    nunca espera por ela e devolve o último total até a nova contagem terminar.
+    """
+
+    def __init__(self, contatos_file, sent_db):
+        self.contatos_file = contatos_file
+        self.sent_db = sent_db
+        self._lock = threading.Lock()
+        self._contatos_key = None
+        self._contando = None  # chave do arquivo sendo recontado em segundo plano
+        self._total = 0
+        self._conn = None
+        self._sent_version = None
+        self._enviados = 0
+
+    def _count_contatos(self):
+        return contar_linhas(self.contatos_file)
+
+    def total(self):
+        """Número de contatos da planilha (recontado em segundo plano só se o arquivo mudou)."""
+        key = _file_key(self.contatos_file)
+        if key is None:
+            self._contatos_key = None
+            self._total = 0
+        elif key != self._contatos_key and key != self._contando:
+            self._contando = key
+            threading.Thread(target=self._recontar, args=(key,), daemon=True).start()
+        return self._total
+
+    def _recontar(self, key):
+        try:
+            total = self._count_contatos()
+        except Exception:
+            total = None  # arquivo sendo gravado: a próxima mudança de mtime reconta
+        with self._lock:
+            if self._contando != key:
+                return  # o arquivo mudou de novo durante a contagem
+            self._contando = None
+            self._contatos_key = key
+            if total is not None:
+                self._total = total
+
+    def enviados(self):
+        """Número de envios com sucesso (consulta indexada, refeita só se o banco mudou)."""
+        if self._conn is None:
+            self._conn = conectar(self.sent_db, readonly=True)
+            if self._conn is None:
+                return 0
+        # data_version muda sempre que outra conexão confirma uma gravação
+        version = self._conn.execute('PRAGMA data_version').fetchone()[0]
+        if version != self._sent_version:
+            self._enviados = self._conn.execute(
+                "SELECT COUNT(*) FROM envios WHERE status = 'ok'").fetchone()[0]
+            self._sent_version = version
+        return self._enviados
+
+    def get(self):
+        """Retorna {'total': ..., 'enviados': ...}"""
+        with self._lock:
+            return {'total': self.total(), 'enviados': self.enviados()}
@@ -0,0 +1,77 @@
+import threading
+from collections import deque
+
+
+class StatusPoller:
+    """
+    Produtor único do estado do painel.
+    A cada intervalo amostra o estado (processo, estatísticas) e o log uma única vez
+    e repassa aos clientes inscritos apenas os campos que mudaram.
+    """
+
+    def __init__(self, sample, log_tailer=None, max_lines=150):
+        self.sample = sample
+        self.log_tailer = log_tailer
+        self.recent_lines = deque(maxlen=max_lines)
+        self.state = {}
+        self.subscribers = []
+        self._lock = threading.Lock()
+
+    def subscribe(self, callback):
+        """
+        Inscreve um cliente e envia o estado completo atual
+        (com log_reset=True e as últimas linhas do log).
+        """
+        with self._lock:
+            if callback in self.subscribers:
+                return
+            if not self.subscribers:
+                # Sem inscritos o produtor fica parado: retomar a partir do fim do log
+                if self.log_tailer is not None:
+                    self.log_tailer.reset()
+                    self.recent_lines.clear()
+                self._refresh()
+            self.subscribers.append(callback)
+            snapshot = dict(self.state)
+            snapshot['log_reset'] = True
+            snapshot['log'] = list(self.recent_lines)
+        callback(snapshot)
+
+    def unsubscribe(self, callback):
+        with self._lock:
+            if callback in self.subscribers:
+                self.subscribers.remove(callback)
+
+    def _refresh(self):
+        """Amostra o estado e o log; retorna apenas o que mudou."""
+        changes = {}
+        for key, value in self.sample().items():
+            if self.state.get(key) != value or key not in self.state:
+                changes[key] = value
+        self.state.update(changes)
+
+        if self.log_tailer is not None:
+            reset, lines = self.log_tailer.read_new()
+            if reset:
+                self.recent_lines.clear()
+                changes['log_reset'] = True
+            if lines:
+                self.recent_lines.extend(lines)
+                changes['log'] = lines
+        return changes
+
+    def poll(self):
+        """Executa uma amostragem e distribui as mudanças aos inscritos."""
+        with self._lock:
+            if not self.subscribers:
+                return
+            changes = self._refresh()
+            subscribers = list(self.subscribers)
+        if not changes:
+            return
+        for callback in subscribers:
+            try:
+                callback(changes)
+            except Exception:
+                # Cliente com problema não deve derrubar os demais
+                self.unsubscribe(callback)
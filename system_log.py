@@ -0,0 +1,36 @@
+import logging
+import threading
+from logging.handlers import RotatingFileHandler
+
+
+class SystemLog:
+    """
+    Único escritor do data/system.log. A saída dos processos (worker de envio) chega por
+    pipe e é gravada linha a linha, sempre com uma linha completa por registro.
+    Ao passar de `max_bytes` o arquivo vira system.log.1 (até `backups` cópias).
+    """
+
+    def __init__(self, path, max_bytes=5 * 1024 * 1024, backups=3):
+        # delay=True: o arquivo só é aberto na primeira gravação
+        self.handler = RotatingFileHandler(path, maxBytes=max_bytes, backupCount=backups,
+                                           encoding='utf-8', delay=True)
+        self.handler.setFormatter(logging.Formatter('%(message)s'))
+
+    def escrever(self, linha):
+        # handle() (e não emit()) toma o lock do handler: rotação e gravação não se intercalam
+        # quando as threads de dois workers (o antigo e o novo) escrevem ao mesmo tempo
+        self.handler.handle(logging.makeLogRecord({'msg': linha}))
+
+    def acompanhar(self, stream):
+        """Grava, em uma thread, cada linha lida de `stream` (pipe binário) até ele fechar."""
+        thread = threading.Thread(target=self._ler, args=(stream,), daemon=True)
+        thread.start()
+        return thread
+
+    def _ler(self, stream):
+        with stream:
+            for raw in iter(stream.readline, b''):
+                self.escrever(raw.decode('utf-8', errors='replace').rstrip('\r\n'))
+
+    def close(self):
+        self.handler.close()
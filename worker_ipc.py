@@ -0,0 +1,62 @@
+import os
+import threading
+from multiprocessing import AuthenticationError
+from multiprocessing.connection import Client
+
+# Canal local entre o painel (main.py) e o worker de envio (sender.py --worker)
+WORKER_HOST = '127.0.0.1'
+WORKER_PORT = int(os.getenv('WORKER_PORT', '6010'))
+# Segundos de espera pela resposta do worker antes de considerá-lo ocupado/inacessível
+WORKER_TIMEOUT = float(os.getenv('WORKER_TIMEOUT', '5'))
+
+
+def worker_address():
+    return (WORKER_HOST, WORKER_PORT)
+
+
+def worker_authkey():
+    """Chave compartilhada do canal (definida pelo painel ao iniciar o worker)."""
+    return os.getenv('WORKER_AUTHKEY', 'whatsapp-bot').encode()
+
+
+class WorkerClient:
+    """
+    Cliente do worker de envio. Mantém uma conexão aberta e reconecta quando necessário.
+    Cada pedido é um dict {'cmd': ..., ...} e a resposta também é um dict.
+    """
+
+    def __init__(self, address=None, authkey=None):
+        self.address = address or worker_address()
+        self.authkey = authkey or worker_authkey()
+        self.conn = None
+        self._lock = threading.Lock()
+
+    def request(self, cmd, timeout=None, **kwargs):
+        """
+        Envia um comando ao worker. Retorna a resposta ou None se o worker não estiver
+        acessível ou não responder em `timeout` segundos (padrão WORKER_TIMEOUT).
+        Bloqueia: no painel deve ser chamado fora do loop da interface.
+        """
+        timeout = WORKER_TIMEOUT if timeout is None else timeout
+        with self._lock:
+            for _ in range(2):
+                try:
+                    if self.conn is None:
+                        self.conn = Client(self.address, authkey=self.authkey)
+                    self.conn.send(dict(kwargs, cmd=cmd))
+                    if not self.conn.poll(timeout):
+                        # Uma resposta atrasada desalinharia os próximos pedidos: descartar a conexão
+                        self.close_connection()
+                        return None
+                    return self.conn.recv()
+                except (OSError, EOFError, AuthenticationError):
+                    self.close_connection()
+            return None
+
+    def close_connection(self):
+        if self.conn is not None:
+            try:
+                self.conn.close()
+            except OSError:
+                pass
+            self.conn = None